@@ -0,0 +1,70 @@
+"""Refreshes the bundled JSON schemas used by `stac nrcanradarsat1 validate`.
+
+Downloads the core STAC Item schema and the extension schemas used by this
+package, following $refs, into src/stactools/nrcan_radarsat1/schemas. Run on a
+machine with network access and commit the result.
+"""
+import json
+import os
+import urllib.request
+from urllib.parse import urldefrag, urljoin, urlparse
+
+import pystac
+from pystac.extensions.projection import ProjectionExtension
+from pystac.extensions.raster import RasterExtension
+from pystac.extensions.sar import SarExtension
+from pystac.extensions.sat import SatExtension
+
+SCHEMA_DIR = os.path.join(os.path.dirname(__file__), "..", "src", "stactools",
+                          "nrcan_radarsat1", "schemas")
+
+# Meta-schemas are shipped with jsonschema
+SKIP_HOSTS = ("json-schema.org", )
+
+ITEM_SCHEMA_URI = (
+    "https://schemas.stacspec.org/v{}/item-spec/json-schema/item.json")
+
+# The current STAC version, and 1.0.0 of items already in the archive
+start_uris = [
+    ITEM_SCHEMA_URI.format(pystac.get_stac_version()),
+    ITEM_SCHEMA_URI.format("1.0.0"),
+    SarExtension.get_schema_uri(),
+    SatExtension.get_schema_uri(),
+    ProjectionExtension.get_schema_uri(),
+    RasterExtension.get_schema_uri(),
+]
+
+
+def find_refs(node):
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if key == "$ref" and isinstance(value, str):
+                yield value
+            else:
+                yield from find_refs(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from find_refs(value)
+
+
+seen = set()
+queue = list(start_uris)
+while queue:
+    uri = urldefrag(queue.pop())[0]
+    parsed = urlparse(uri)
+    if uri in seen or not uri or parsed.netloc in SKIP_HOSTS:
+        continue
+    seen.add(uri)
+
+    print("Fetching {}".format(uri))
+    with urllib.request.urlopen(uri) as response:
+        schema = json.load(response)
+
+    path = os.path.join(SCHEMA_DIR, parsed.netloc, *parsed.path.split("/"))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(schema, f, indent=2)
+        f.write("\n")
+
+    for ref in find_refs(schema):
+        queue.append(urljoin(uri, ref))
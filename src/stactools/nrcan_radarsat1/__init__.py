@@ -1,7 +1,8 @@
 import stactools.core
-from stactools.nrcan_radarsat1.stac import create_collection, create_item
+from stactools.nrcan_radarsat1.stac import (create_collection, create_item,
+                                            iter_items)
 
-__all__ = ['create_collection', 'create_item']
+__all__ = ['create_collection', 'create_item', 'iter_items']
 
 stactools.core.use_fsspec()
 
@@ -0,0 +1,263 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from stactools.nrcan_radarsat1.storage import RangeFile, Storage, get_storage
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024 * 1024
+
+# Size and version of the file the blocks of an href were read from
+_INFO_FILE = "info.json"
+
+
+class BlockCache():
+    """
+    Opt-in read-through block cache for COG assets, stored on local disk.
+
+    Remote files are read in fixed size blocks keyed by endpoint, href and
+    byte range, stored as <hash of endpoint and href>/<block size>/<index>.
+    Blocks are kept on disk until the cache grows past max_bytes, at which point
+    the least recently used blocks are evicted.
+
+    The size and version (ETag or last modification time) of each file are
+    stored next to its blocks and checked against the source once per href and
+    cache instance. Blocks of a file that has since been replaced are dropped.
+    """
+    def __init__(self,
+                 directory: str,
+                 max_bytes: int = DEFAULT_MAX_BYTES,
+                 block_size: int = DEFAULT_BLOCK_SIZE,
+                 storage: Optional[Storage] = None,
+                 endpoint_url: Optional[str] = None):
+        """
+        Args:
+        directory: local directory holding cached blocks. Created if missing.
+        max_bytes: upper bound on the total size of cached blocks
+        block_size: size of the byte ranges fetched from the source
+        storage: storage backend blocks are fetched from. Default: by href scheme.
+        endpoint_url: S3-compatible endpoint of s3:// hrefs, when storage is not set
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.block_size = block_size
+        self.storage = storage
+        self.endpoint_url = endpoint_url
+
+        # Counters of traffic to the underlying source
+        self.requests = 0
+        self.bytes_fetched = 0
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._blocks: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        self._sizes: Dict[str, int] = {}
+
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def open(self, href: str, mode: str = "rb") -> RangeFile:
+        """
+        Open href as a read-only file object served through the cache.
+        Can be passed to rasterio.open as opener.
+
+        Args:
+        href: path or url (s3://, http(s)://, local) of the file
+        mode: file mode, only binary read is supported
+
+        Returns:
+        RangeFile: seekable file object
+
+        Raises:
+        the source's error (e.g. HTTPError, FileNotFoundError) if the size of
+        the file can not be looked up
+        """
+        return RangeFile(self, href, mode, block_size=self.block_size)
+
+    def size(self, href: str) -> int:
+        """
+        Size in bytes of the file at href. Looked up from the source the first
+        time, dropping the cached blocks of href if the file has changed.
+        """
+        with self._lock:
+            if href in self._sizes:
+                return self._sizes[href]
+
+        info = self._storage(href).info(href)
+        with self._lock:
+            self.requests += 1
+
+        href_dir = self._href_dir(href)
+        info_path = os.path.join(href_dir, _INFO_FILE)
+        current = {"size": info.size, "version": info.version}
+        try:
+            with open(info_path) as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            cached = None
+        if cached != current:
+            if cached is not None:
+                logger.info("{} has changed, dropping its cached blocks".format(
+                    href))
+            self._remove_href(href_dir)
+            os.makedirs(href_dir, exist_ok=True)
+            _atomic_write(info_path, json.dumps(current).encode())
+
+        with self._lock:
+            self._sizes[href] = info.size
+        return info.size
+
+    def read_range(self, href: str, start: int, end: int) -> bytes:
+        """
+        Read bytes [start, end) of href, fetching missing blocks from the source
+
+        Args:
+        href: path or url of the file
+        start: first byte to read
+        end: byte after the last byte to read
+        """
+        end = min(end, self.size(href))
+        if start >= end:
+            return b""
+
+        first = start // self.block_size
+        last = (end - 1) // self.block_size
+        chunks = [self._get_block(href, i) for i in range(first, last + 1)]
+        data = b"".join(chunks)
+        offset = start - first * self.block_size
+        return data[offset:offset + end - start]
+
+    def clear(self) -> None:
+        """
+        Remove all cached blocks
+        """
+        with self._lock:
+            keys = list(self._blocks)
+        for key in keys:
+            self._remove(key)
+
+    @property
+    def total_bytes(self) -> int:
+        '''returns the size of all cached blocks in bytes'''
+        return self._total_bytes
+
+    def _storage(self, href: str) -> Storage:
+        if self.storage is not None:
+            return self.storage
+        return get_storage(href, endpoint_url=self.endpoint_url)
+
+    def _href_dir(self, href: str) -> str:
+        # The same s3:// href on two endpoints are two different files
+        endpoint = self._storage(href).endpoint_url or ""
+        digest = hashlib.sha256("{}\n{}".format(endpoint, href).encode())
+        return os.path.join(self.directory, digest.hexdigest()[:32])
+
+    def _get_block(self, href: str, index: int) -> bytes:
+        block_dir = os.path.join(self._href_dir(href), str(self.block_size))
+        key = os.path.join(block_dir, str(index))
+
+        with self._lock:
+            cached = key in self._blocks
+            if cached:
+                self._blocks.move_to_end(key)
+        if cached:
+            try:
+                with open(key, "rb") as f:
+                    data = f.read()
+                with self._lock:
+                    self.hits += 1
+                os.utime(key)
+                return data
+            except OSError:
+                # Evicted by another process sharing the directory
+                self._forget(key)
+
+        start = index * self.block_size
+        end = min(start + self.block_size, self.size(href))
+        data = self._storage(href).read_range(href, start, end)
+
+        with self._lock:
+            self.misses += 1
+            self.requests += 1
+            self.bytes_fetched += len(data)
+
+        os.makedirs(block_dir, exist_ok=True)
+        _atomic_write(key, data)
+        with self._lock:
+            if key not in self._blocks:
+                self._total_bytes += len(data)
+            self._blocks[key] = len(data)
+            self._blocks.move_to_end(key)
+        self._evict()
+        return data
+
+    def _evict(self) -> None:
+        while True:
+            with self._lock:
+                if self._total_bytes <= self.max_bytes or len(
+                        self._blocks) <= 1:
+                    return
+                key = next(iter(self._blocks))
+            self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        self._forget(key)
+        try:
+            os.remove(key)
+        except OSError:
+            pass
+
+    def _remove_href(self, href_dir: str) -> None:
+        prefix = href_dir + os.sep
+        with self._lock:
+            keys = [key for key in self._blocks if key.startswith(prefix)]
+        for key in keys:
+            self._remove(key)
+
+    def _forget(self, key: str) -> None:
+        with self._lock:
+            size = self._blocks.pop(key, None)
+            if size is not None:
+                self._total_bytes -= size
+
+    def _load_index(self) -> None:
+        """
+        Rebuild the LRU index from blocks left on disk by earlier runs
+        """
+        found = []
+        for href_dir in os.scandir(self.directory):
+            if not href_dir.is_dir():
+                continue
+            for block_dir in os.scandir(href_dir.path):
+                if not block_dir.is_dir() or not block_dir.name.isdigit():
+                    continue
+                for entry in os.scandir(block_dir.path):
+                    if not entry.name.isdigit():
+                        continue
+                    stat = entry.stat()
+                    found.append((stat.st_mtime, entry.path, stat.st_size))
+
+        for _, path, size in sorted(found):
+            self._blocks[path] = size
+            self._total_bytes += size
+        self._evict()
+
+
+def _atomic_write(path: str, data: bytes) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
@@ -1,13 +1,35 @@
+import json
 import logging
 import click
 import os
+from typing import List, Optional
 
-from stactools.nrcan_radarsat1.stac import create_collection, create_item
-from stactools.nrcan_radarsat1.utils import download_asset
+from stactools.nrcan_radarsat1.cache import DEFAULT_BLOCK_SIZE, BlockCache
+from stactools.nrcan_radarsat1.grouping import (group_scenes, grouped_hrefs,
+                                                orbit_runs)
+from stactools.nrcan_radarsat1.plan import estimate_plan
+from stactools.nrcan_radarsat1.stac import (ItemCreationError,
+                                            create_collection, create_item,
+                                            create_orbit_segment_item,
+                                            iter_items, save_items,
+                                            write_ndjson)
+from stactools.nrcan_radarsat1.storage import get_storage, join_href
+from stactools.nrcan_radarsat1.utils import download_asset, list_hrefs
+from stactools.nrcan_radarsat1.validate import validate_items
 
 logger = logging.getLogger(__name__)
 
 
+def _get_cache(cache_dir: Optional[str], cache_size: int,
+               endpoint_url: Optional[str]) -> Optional[BlockCache]:
+    # Blocks are fetched with the storage backend of each COG href
+    if cache_dir is None:
+        return None
+    return BlockCache(cache_dir,
+                      max_bytes=cache_size * 1024 * 1024,
+                      endpoint_url=endpoint_url)
+
+
 def create_nrcanradarsat1_command(cli):
     """Creates a command line utility for working with Radarsat-1 cogs"""
     @cli.group(
@@ -58,20 +80,76 @@ def create_nrcanradarsat1_command(cli):
         required=True,
         help="The output directory for the STAC json",
     )
-    def create_item_command(source: str, destination: str):
+    @click.option(
+        "--cache-dir",
+        help="Local directory for a read-through cache of COG byte ranges",
+    )
+    @click.option(
+        "--cache-size",
+        type=int,
+        default=10240,
+        show_default=True,
+        help="Maximum size of the local cache in MB",
+    )
+    @click.option(
+        "--statistics",
+        is_flag=True,
+        help="Record scene statistics computed from the footprint read",
+    )
+    @click.option(
+        "--footprint-scale",
+        type=click.Choice(["1", "2", "4", "8", "16"]),
+        default="2",
+        show_default=True,
+        help="Subsampling of the band read for the footprint",
+    )
+    @click.option(
+        "--s3-endpoint-url",
+        help="Url of an S3-compatible endpoint for s3:// hrefs",
+    )
+    @click.option(
+        "--thumbnail",
+        is_flag=True,
+        help="Write a thumbnail to destination and add it as an asset",
+    )
+    @click.option(
+        "--thumbnail-format",
+        type=click.Choice(["png", "webp"]),
+        default="png",
+        show_default=True,
+        help="Image format of the thumbnail",
+    )
+    def create_item_command(source: str, destination: str,
+                            cache_dir: Optional[str], cache_size: int,
+                            statistics: bool, footprint_scale: str,
+                            s3_endpoint_url: Optional[str], thumbnail: bool,
+                            thumbnail_format: str):
         """Creates a STAC Item from a Radarsat-1 COG
 
         Args:
             source (str): Path to a Radarsat-1 COG
             destination (str): Directory to create the stac item json
+            cache_dir (str): Optional directory for a local read-through cache
+            cache_size (int): Maximum size of the local cache in MB
+            statistics (bool): Record scene statistics in the item
+            footprint_scale (str): Subsampling of the band read for the footprint
+            s3_endpoint_url (str): Url of an S3-compatible endpoint
+            thumbnail (bool): Write a thumbnail and add it as an asset
+            thumbnail_format (str): Image format of the thumbnail
         Returns:
             Callable
         """
-        output_path = os.path.join(destination,
-                                   os.path.basename(source)[:-4] + ".json")
-        item = create_item(source)
-        item.set_self_href(output_path)
-        item.save_object(dest_href=output_path)
+        write_storage = get_storage(destination, endpoint_url=s3_endpoint_url)
+        item = create_item(source,
+                           cache=_get_cache(cache_dir, cache_size,
+                                            s3_endpoint_url),
+                           statistics=statistics,
+                           footprint_scale=int(footprint_scale),
+                           endpoint_url=s3_endpoint_url,
+                           thumbnail_dir=destination if thumbnail else None,
+                           thumbnail_format=thumbnail_format,
+                           thumbnail_storage=write_storage)
+        save_items([item], destination, storage=write_storage)
 
     @nrcanradarsat1.command(
         "download-asset",
@@ -89,13 +167,342 @@ def create_nrcanradarsat1_command(cli):
         required=True,
         help="The output directory for the COG file",
     )
-    def download_asset_command(source: str, destination: str):
+    @click.option(
+        "--cache-dir",
+        help="Local directory for a read-through cache of COG byte ranges",
+    )
+    @click.option(
+        "--cache-size",
+        type=int,
+        default=10240,
+        show_default=True,
+        help="Maximum size of the local cache in MB",
+    )
+    @click.option(
+        "--s3-endpoint-url",
+        help="Url of an S3-compatible endpoint for s3:// hrefs",
+    )
+    def download_asset_command(source: str, destination: str,
+                               cache_dir: Optional[str], cache_size: int,
+                               s3_endpoint_url: Optional[str]):
         """Downloads a Radarsat-1 COG
 
         Args:
             source (str): url for Radarsat-1 COG
             destination (str): Directory to download the COG
+            cache_dir (str): Optional directory for a local read-through cache
+            cache_size (int): Maximum size of the local cache in MB
+            s3_endpoint_url (str): Url of an S3-compatible endpoint
+        Returns:
+            Callable
+        """
+        download_asset(source,
+                       destination,
+                       cache=_get_cache(cache_dir, cache_size,
+                                        s3_endpoint_url),
+                       endpoint_url=s3_endpoint_url)
+
+    @nrcanradarsat1.command(
+        "validate",
+        short_help="Validates STAC Items offline against bundled schemas",
+    )
+    @click.option(
+        "-s",
+        "--source",
+        required=True,
+        multiple=True,
+        help="NDJSON file, item json file, or directory of items",
+    )
+    @click.option(
+        "--schema-dir",
+        multiple=True,
+        help="Additional local directory of JSON schemas",
+    )
+    @click.option(
+        "-w",
+        "--workers",
+        type=int,
+        help="Number of worker processes (default: number of CPUs)",
+    )
+    def validate_command(source: List[str], schema_dir: List[str],
+                         workers: Optional[int]):
+        """Validates STAC Items in parallel without fetching schemas
+
+        Args:
+            source (list): NDJSON files, item json files, or directories of items
+            schema_dir (list): Additional local directories of JSON schemas
+            workers (int): Number of worker processes
+        Returns:
+            Callable
+        """
+        total = 0
+        failed = 0
+        for result in validate_items(source, schema_dir, workers=workers):
+            total += 1
+            if not result.valid:
+                failed += 1
+                click.echo("{} ({})".format(result.item_id, result.source))
+                for error in result.errors:
+                    click.echo("    {}".format(error))
+
+        click.echo("{} of {} items failed validation".format(failed, total))
+        if failed:
+            raise click.exceptions.Exit(1)
+
+    @nrcanradarsat1.command(
+        "plan",
+        short_help="Estimates COG reads of a bulk ingestion",
+    )
+    @click.option(
+        "-s",
+        "--source",
+        required=True,
+        help="Manifest of COG hrefs (one per line), directory, or prefix",
+    )
+    @click.option(
+        "-n",
+        "--sample-size",
+        type=int,
+        default=10,
+        show_default=True,
+        help="Number of scenes to measure",
+    )
+    @click.option(
+        "--seed",
+        type=int,
+        default=0,
+        help="Random seed for the sample",
+    )
+    @click.option(
+        "--statistics",
+        is_flag=True,
+        help="Plan for items with scene statistics",
+    )
+    @click.option(
+        "--footprint-scale",
+        type=click.Choice(["1", "2", "4", "8", "16"]),
+        default="2",
+        show_default=True,
+        help="Subsampling of the band read for the footprint",
+    )
+    @click.option(
+        "--cache",
+        is_flag=True,
+        help="Plan for a run reading through a cold --cache-dir",
+    )
+    @click.option(
+        "-o",
+        "--output",
+        help="Path to write the json report to (default: stdout)",
+    )
+    @click.option(
+        "--s3-endpoint-url",
+        help="Url of an S3-compatible endpoint for s3:// hrefs",
+    )
+    def plan_command(source: str, sample_size: int, seed: int,
+                     statistics: bool, footprint_scale: str, cache: bool,
+                     output: Optional[str], s3_endpoint_url: Optional[str]):
+        """Dry run of a bulk ingestion: measures a sample of scenes and
+        extrapolates bytes, requests and time per beam mode/product type
+
+        Only the reads of item creation are measured. Downloads are estimated
+        as the size of the COGs alone, and thumbnail and item writes are not
+        estimated (see "scope" in the report).
+
+        Args:
+            source (str): Manifest, local directory, or s3 prefix of COGs
+            sample_size (int): Number of scenes to measure
+            seed (int): Random seed for the sample
+            statistics (bool): Plan for items with scene statistics
+            footprint_scale (str): Subsampling of the band read for the footprint
+            cache (bool): Plan for a run reading through a cold cache
+            output (str): Path to write the json report to
+            s3_endpoint_url (str): Url of an S3-compatible endpoint
+        Returns:
+            Callable
+        """
+        # The source backend only lists the COGs, each is read with its own
+        hrefs = list_hrefs(source,
+                           storage=get_storage(source,
+                                               endpoint_url=s3_endpoint_url))
+        report = estimate_plan(hrefs,
+                               sample_size=sample_size,
+                               seed=seed,
+                               endpoint_url=s3_endpoint_url,
+                               cache_block_size=DEFAULT_BLOCK_SIZE
+                               if cache else None,
+                               statistics=statistics,
+                               footprint_scale=int(footprint_scale))
+        if output is None:
+            click.echo(json.dumps(report, indent=2))
+        else:
+            with open(output, "w") as f:
+                json.dump(report, f, indent=2)
+
+    @nrcanradarsat1.command(
+        "create-items",
+        short_help="Create STAC items for many Radarsat-1 COGs",
+    )
+    @click.option(
+        "-s",
+        "--source",
+        required=True,
+        help="Manifest of COG hrefs (one per line), directory, or prefix",
+    )
+    @click.option(
+        "-d",
+        "--destination",
+        required=True,
+        help="The output directory or prefix for the STAC json",
+    )
+    @click.option(
+        "--ndjson",
+        help="Write all items to this NDJSON file in destination",
+    )
+    @click.option(
+        "-w",
+        "--workers",
+        type=int,
+        default=16,
+        show_default=True,
+        help="Number of concurrent item writes",
+    )
+    @click.option(
+        "-c",
+        "--concurrency",
+        type=int,
+        default=8,
+        show_default=True,
+        help="Number of items created at the same time",
+    )
+    @click.option(
+        "--cache-dir",
+        help="Local directory for a read-through cache of COG byte ranges",
+    )
+    @click.option(
+        "--cache-size",
+        type=int,
+        default=10240,
+        show_default=True,
+        help="Maximum size of the local cache in MB",
+    )
+    @click.option(
+        "--statistics",
+        is_flag=True,
+        help="Record scene statistics computed from the footprint read",
+    )
+    @click.option(
+        "--footprint-scale",
+        type=click.Choice(["1", "2", "4", "8", "16"]),
+        default="2",
+        show_default=True,
+        help="Subsampling of the band read for the footprint",
+    )
+    @click.option(
+        "--s3-endpoint-url",
+        help="Url of an S3-compatible endpoint for s3:// hrefs",
+    )
+    @click.option(
+        "--thumbnail",
+        is_flag=True,
+        help="Write a thumbnail to destination and add it as an asset",
+    )
+    @click.option(
+        "--thumbnail-format",
+        type=click.Choice(["png", "webp"]),
+        default="png",
+        show_default=True,
+        help="Image format of the thumbnail",
+    )
+    @click.option(
+        "--orbit-segments",
+        is_flag=True,
+        help="Also create an item merging the scenes of each orbit and day",
+    )
+    def create_items_command(source: str, destination: str,
+                             ndjson: Optional[str], workers: int,
+                             concurrency: int, cache_dir: Optional[str],
+                             cache_size: int,
+                             statistics: bool, footprint_scale: str,
+                             s3_endpoint_url: Optional[str], thumbnail: bool,
+                             thumbnail_format: str, orbit_segments: bool):
+        """Creates STAC Items for all Radarsat-1 COGs of a manifest or prefix
+
+        Args:
+            source (str): Manifest, directory, or prefix of COGs
+            destination (str): Directory or prefix to write the items to
+            ndjson (str): Optional NDJSON file name to write all items to
+            workers (int): Number of concurrent item writes
+            concurrency (int): Number of items created at the same time
+            cache_dir (str): Optional directory for a local read-through cache
+            cache_size (int): Maximum size of the local cache in MB
+            statistics (bool): Record scene statistics in the items
+            footprint_scale (str): Subsampling of the band read for the footprint
+            s3_endpoint_url (str): Url of an S3-compatible endpoint
+            thumbnail (bool): Write thumbnails and add them as assets
+            thumbnail_format (str): Image format of the thumbnails
+            orbit_segments (bool): Create orbit segment items
         Returns:
             Callable
         """
-        download_asset(source, destination)
+        # The source backend only lists the COGs, each is read with its own
+        hrefs = list_hrefs(source,
+                           storage=get_storage(source,
+                                               endpoint_url=s3_endpoint_url))
+        cache = _get_cache(cache_dir, cache_size, s3_endpoint_url)
+        write_storage = get_storage(destination, endpoint_url=s3_endpoint_url)
+        thumbnail_dir = destination if thumbnail else None
+        segments = []
+
+        # Ordering only: scenes of one pass are created next to each other
+        # and in order, so that their runs can be merged as they stream by
+        scene_hrefs = hrefs
+        if orbit_segments:
+            groups = group_scenes(hrefs)
+            logger.info("Grouped {} scenes into {} passes".format(
+                len(hrefs), len(groups)))
+            scene_hrefs = grouped_hrefs(groups)
+
+        def _scene_items():
+            for result in iter_items(scene_hrefs,
+                                     concurrency=concurrency,
+                                     ordered=orbit_segments,
+                                     cache=cache,
+                                     statistics=statistics,
+                                     footprint_scale=int(footprint_scale),
+                                     endpoint_url=s3_endpoint_url,
+                                     thumbnail_dir=thumbnail_dir,
+                                     thumbnail_format=thumbnail_format,
+                                     thumbnail_storage=write_storage):
+                if isinstance(result, ItemCreationError):
+                    logger.error(str(result))
+                else:
+                    yield result
+
+        def _items():
+            if not orbit_segments:
+                yield from _scene_items()
+                return
+            for run in orbit_runs(_scene_items()):
+                yield from run
+                try:
+                    segment = create_orbit_segment_item(run)
+                except ValueError as e:
+                    logger.warning(str(e))
+                    continue
+                segments.append(segment.id)
+                yield segment
+
+        if ndjson is not None:
+            count = write_ndjson(_items(),
+                                 join_href(destination, ndjson),
+                                 storage=write_storage)
+        else:
+            count = save_items(_items(),
+                               destination,
+                               storage=write_storage,
+                               max_workers=workers)
+        click.echo("Created {} of {} items".format(count - len(segments),
+                                                   len(hrefs)))
+        if orbit_segments:
+            click.echo("Created {} orbit segment items".format(len(segments)))
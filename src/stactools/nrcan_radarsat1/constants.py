@@ -26,6 +26,23 @@ RADARSAT_CENTER_FREQUENCY = 5.6
 RADARSAT_OBSERVATION_DIRECTION = sar.ObservationDirection.RIGHT
 RADARSAT_POLARIZATIONS = [sar.Polarization.HH]
 
+# Item properties for scene statistics not covered by the raster extension
+RADARSAT_VALID_FRACTION = "nrcan-radarsat1:valid_fraction"
+RADARSAT_NODATA_FRACTION = "nrcan-radarsat1:nodata_fraction"
+RADARSAT_PERCENTILES = "nrcan-radarsat1:percentiles"
+RADARSAT_MEAN_DB = "nrcan-radarsat1:mean_db"
+
+# Thumbnails are at most this many pixels per side
+RADARSAT_THUMBNAIL_SIZE = 512
+RADARSAT_THUMBNAIL_FORMATS = {
+    "png": ("PNG", pystac.MediaType.PNG),
+    "webp": ("WEBP", "image/webp"),
+}
+
+# Orbit segment items merge the scenes of one pass (absolute orbit and day)
+RADARSAT_ORBIT_SEGMENT_ID = "RS1_ORBIT_{orbit}_{date}"
+RADARSAT_SCENES = "nrcan-radarsat1:scenes"
+
 RADARSAT_DATA_PROVIDER = pystac.Provider(
     name="Canadian Space Agency (CSA)",
     roles=[ProviderRole.PRODUCER, ProviderRole.LICENSOR],
@@ -0,0 +1,99 @@
+import datetime
+import logging
+import os
+from itertools import groupby
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import pystac
+from pystac.extensions.sat import SatExtension
+
+logger = logging.getLogger(__name__)
+
+# Scenes of one pass are acquired back to back, while passes over the archive's
+# coverage are at least part of the ~101 minute orbit apart
+DEFAULT_MAX_GAP = datetime.timedelta(minutes=10)
+
+# Key of the group of hrefs whose filenames have no acquisition time
+UNGROUPED_KEY = "ungrouped"
+
+
+class SceneGroup(NamedTuple):
+    """Scenes acquired on one pass, in acquisition order"""
+    key: str
+    hrefs: List[str]
+
+
+def scene_datetime(href: str) -> datetime.datetime:
+    """
+    Acquisition time of a scene, parsed from its filename,
+    e.g. 2009-02-05 09:43:41 for RS1_X0597984_F1_20090205_094341_HH_SGF.tif
+    """
+    fname = os.path.splitext(os.path.basename(href))[0].split("_")
+    return datetime.datetime.strptime(fname[3] + fname[4], "%Y%m%d%H%M%S")
+
+
+def group_scenes(
+        hrefs: Iterable[str],
+        max_gap: datetime.timedelta = DEFAULT_MAX_GAP) -> List[SceneGroup]:
+    """
+    Group scenes by day and pass before any of them is read.
+
+    The absolute orbit is only stored in the COG tags, so passes are told apart
+    by the gaps between acquisition times in the filenames. The grouping only
+    orders the scenes: creating items from grouped_hrefs keeps the scenes of
+    one orbit next to each other for orbit_runs. Each scene is still read on
+    its own, as scenes of a pass are separate COGs with no bytes in common.
+
+    Args:
+        hrefs: COG hrefs
+        max_gap (timedelta): longest gap between consecutive scenes of one pass
+
+    Returns:
+        list of SceneGroup in acquisition order, keyed by the date and time of
+        their first scene, e.g. "20090205_094341", followed by a group keyed
+        UNGROUPED_KEY of the hrefs not named like a scene, if any
+    """
+    scenes: List[Tuple[datetime.datetime, str]] = []
+    ungrouped: List[str] = []
+    for href in hrefs:
+        try:
+            scenes.append((scene_datetime(href), href))
+        except (IndexError, ValueError):
+            logger.warning(
+                "No acquisition time in {}, not grouped".format(href))
+            ungrouped.append(href)
+
+    groups: List[SceneGroup] = []
+    previous: Optional[datetime.datetime] = None
+    for acquired, href in sorted(scenes):
+        if (previous is None or acquired.date() != previous.date()
+                or acquired - previous > max_gap):
+            groups.append(SceneGroup(acquired.strftime("%Y%m%d_%H%M%S"), []))
+        groups[-1].hrefs.append(href)
+        previous = acquired
+    if ungrouped:
+        groups.append(SceneGroup(UNGROUPED_KEY, ungrouped))
+    return groups
+
+
+def grouped_hrefs(groups: Sequence[SceneGroup]) -> List[str]:
+    """
+    Hrefs of all groups, one group after the other
+    """
+    return [href for group in groups for href in group.hrefs]
+
+
+def orbit_runs(items: Iterable[pystac.Item]) -> Iterator[List[pystac.Item]]:
+    """
+    Split a stream of items into runs of consecutive items of the same
+    absolute orbit and day, e.g. items created from grouped_hrefs.
+
+    Returns:
+        Iterator of lists of items
+    """
+    def _key(item: pystac.Item) -> Tuple[Optional[int], Optional[datetime.date]]:
+        orbit = SatExtension.ext(item).absolute_orbit
+        return orbit, item.datetime.date() if item.datetime else None
+
+    for _, run in groupby(items, key=_key):
+        yield list(run)
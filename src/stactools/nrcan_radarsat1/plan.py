@@ -0,0 +1,326 @@
+import logging
+import os
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from tempfile import TemporaryDirectory
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+import rasterio
+
+from stactools.nrcan_radarsat1.cache import BlockCache
+from stactools.nrcan_radarsat1.storage import (ReadOnlyStorageError, Storage,
+                                               get_storage)
+from stactools.nrcan_radarsat1.utils import Rsat_Metadata
+
+logger = logging.getLogger(__name__)
+
+# Phases of an ingestion run that are measured on the sampled scenes
+ITEM_PHASE = "item"
+DOWNLOAD_PHASE = "download"
+
+# What the estimates cover, recorded in every report so that it is not read
+# as the whole cost of a create-items run
+SCOPE = {
+    ITEM_PHASE: ("measured: bytes, requests and seconds of reading a COG to "
+                 "create its item"),
+    DOWNLOAD_PHASE: ("bytes of the COGs, from their size. Requests and time "
+                     "of downloads are not measured"),
+    "not_measured": [
+        "thumbnail encoding and writes (--thumbnail)",
+        "writes of items and NDJSON to the destination",
+    ],
+}
+
+# e.g. "VSICURL: Downloading 0-16383 (https://...)..." or, for merged reads,
+# "S3: Downloading 0-16383,65536-81919 (https://...)..."
+_GDAL_DOWNLOAD = re.compile(r"Downloading (\d+-\d+(?:,\d+-\d+)*)")
+
+
+def scene_group(href: str) -> str:
+    """
+    Beam mode and product type of a scene, parsed from its filename,
+    e.g. "F1/SGF" for RS1_X0597984_F1_20090205_094341_HH_SGF.tif
+    """
+    fname = os.path.splitext(os.path.basename(href))[0].split("_")
+    return "{}/{}".format(fname[2], fname[-1][:3])
+
+
+def sample_hrefs(hrefs: Sequence[str], sample_size: int,
+                 seed: int = 0) -> List[str]:
+    """
+    Sample scenes stratified by beam mode and product type, so that small groups
+    of very differently sized products are represented.
+
+    Args:
+        hrefs: all COG hrefs of the run
+        sample_size (int): number of scenes to sample
+        seed (int): random seed
+
+    Returns:
+        list of sampled hrefs
+    """
+    rng = random.Random(seed)
+    groups: Dict[str, List[str]] = defaultdict(list)
+    for href in hrefs:
+        groups[scene_group(href)].append(href)
+    for members in groups.values():
+        rng.shuffle(members)
+
+    # Round robin over groups, largest first
+    ordered = sorted(groups.values(), key=len, reverse=True)
+    sample: List[str] = []
+    depth = 0
+    while len(sample) < min(sample_size, len(hrefs)):
+        for members in ordered:
+            if depth < len(members) and len(sample) < sample_size:
+                sample.append(members[depth])
+        depth += 1
+    return sample
+
+
+class _CountingStorage(Storage):
+    """
+    Read-only wrapper counting the requests and bytes read from a storage
+    """
+    def __init__(self, storage: Storage):
+        self.storage = storage
+        self.endpoint_url = storage.endpoint_url
+        self.requests = 0
+        self.bytes_fetched = 0
+        self._lock = threading.Lock()
+
+    def size(self, href: str) -> int:
+        size = self.storage.size(href)
+        with self._lock:
+            self.requests += 1
+        return size
+
+    def read_range(self, href: str, start: int, end: int) -> bytes:
+        data = self.storage.read_range(href, start, end)
+        with self._lock:
+            self.requests += 1
+            self.bytes_fetched += len(data)
+        return data
+
+    def write(self, href: str, data: bytes) -> None:
+        raise ReadOnlyStorageError(href)
+
+    def write_stream(self, href: str, chunks: Iterable[bytes]) -> None:
+        raise ReadOnlyStorageError(href)
+
+    def list(self, prefix: str, suffix: str = "") -> List[str]:
+        return self.storage.list(prefix, suffix)
+
+
+class _GDALTrafficCounter(logging.Handler):
+    """
+    Counts the HTTP requests and bytes that GDAL's network file systems
+    (/vsicurl/, /vsis3/, ...) report in their CPL_DEBUG messages
+    """
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.requests = 0
+        self.bytes_fetched = 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        message = record.getMessage()
+        if "GetFileSize(" in message:
+            self.requests += 1
+        match = _GDAL_DOWNLOAD.search(message)
+        if match is not None:
+            # Merged reads are sent as one multi-range request
+            self.requests += 1
+            for byte_range in match.group(1).split(","):
+                start, end = byte_range.split("-")
+                self.bytes_fetched += int(end) - int(start) + 1
+
+
+@contextmanager
+def _count_gdal_traffic() -> Iterator[_GDALTrafficCounter]:
+    counter = _GDALTrafficCounter()
+    rasterio_logger = logging.getLogger("rasterio")
+    level, propagate = rasterio_logger.level, rasterio_logger.propagate
+    rasterio_logger.addHandler(counter)
+    rasterio_logger.setLevel(logging.DEBUG)
+    # Keep GDAL's debug messages out of the application's logs
+    rasterio_logger.propagate = False
+    try:
+        with rasterio.Env(CPL_DEBUG=True):
+            yield counter
+    finally:
+        rasterio_logger.removeHandler(counter)
+        rasterio_logger.setLevel(level)
+        rasterio_logger.propagate = propagate
+
+
+def measure_scene(href: str,
+                  storage: Optional[Storage] = None,
+                  endpoint_url: Optional[str] = None,
+                  cache_block_size: Optional[int] = None,
+                  **kwargs: Any) -> Dict[str, Dict[str, float]]:
+    """
+    Measure the bytes, requests and time spent creating the metadata for one
+    scene, reading it the way the planned run will:
+
+    - through a cold BlockCache with the run's block size, if it uses a cache
+    - through the storage backend, if one is given or endpoint_url is set
+    - otherwise natively by GDAL, counting the requests it logs
+
+    Args:
+        href (str): COG href
+        storage (Storage): storage backend the run reads the COG with
+        endpoint_url (str): S3-compatible endpoint of s3:// hrefs
+        cache_block_size (int): block size of the run's cache, None without cache
+        kwargs: Rsat_Metadata options (e.g. statistics, footprint_scale)
+
+    Returns:
+        dict of phase to measurements
+    """
+    if storage is None and endpoint_url is not None:
+        storage = get_storage(href, endpoint_url=endpoint_url)
+
+    with ExitStack() as stack:
+        counter: Any
+        if cache_block_size is not None:
+            cache_dir = stack.enter_context(TemporaryDirectory())
+            counter = BlockCache(cache_dir,
+                                 block_size=cache_block_size,
+                                 storage=storage)
+            kwargs["cache"] = counter
+        elif storage is not None:
+            counter = _CountingStorage(storage)
+            kwargs["storage"] = counter
+        else:
+            counter = stack.enter_context(_count_gdal_traffic())
+
+        start = time.perf_counter()
+        Rsat_Metadata(href, **kwargs)
+        seconds = time.perf_counter() - start
+
+    if storage is None:
+        storage = get_storage(href)
+    return {
+        ITEM_PHASE: {
+            "bytes": counter.bytes_fetched,
+            "requests": counter.requests,
+            "seconds": round(seconds, 3),
+        },
+        DOWNLOAD_PHASE: {
+            "bytes": storage.size(href),
+        },
+    }
+
+
+def estimate_plan(hrefs: Sequence[str],
+                  sample_size: int = 10,
+                  seed: int = 0,
+                  storage: Optional[Storage] = None,
+                  endpoint_url: Optional[str] = None,
+                  cache_block_size: Optional[int] = None,
+                  **kwargs: Any) -> Dict[str, Any]:
+    """
+    Estimate the bytes, requests and time a bulk ingestion run will use by
+    measuring a sample of scenes and extrapolating per beam mode/product type.
+    Groups that were not sampled are extrapolated from the mean of all samples.
+    Hrefs that are not RADARSAT-1 scene names are reported as errors.
+
+    Only reading the COGs is measured, see SCOPE: the download phase is their
+    size alone, and thumbnail and item writes are not estimated.
+
+    Args:
+        hrefs: all COG hrefs of the run
+        sample_size (int): number of scenes to measure
+        seed (int): random seed for the sample
+        storage (Storage): storage backend of the COGs. Default: by href scheme.
+        endpoint_url (str): S3-compatible endpoint of s3:// hrefs
+        cache_block_size (int): block size of the run's cache, None without cache
+        kwargs: Rsat_Metadata options (e.g. statistics, footprint_scale)
+
+    Returns:
+        dict report with per group and total estimates
+    """
+    errors = []
+    groups_of: Dict[str, str] = {}
+    for href in hrefs:
+        try:
+            groups_of[href] = scene_group(href)
+        except IndexError:
+            logger.warning("Not a RADARSAT-1 scene name: {}".format(href))
+            errors.append({
+                "href": href,
+                "error": "not a RADARSAT-1 scene name"
+            })
+    scenes = [href for href in hrefs if href in groups_of]
+
+    samples: Dict[str, List[Dict[str, Dict[str, float]]]] = defaultdict(list)
+    for href in sample_hrefs(scenes, sample_size, seed):
+        try:
+            samples[groups_of[href]].append(
+                measure_scene(href,
+                              storage=storage,
+                              endpoint_url=endpoint_url,
+                              cache_block_size=cache_block_size,
+                              **kwargs))
+        except Exception as e:
+            logger.warning("Could not measure {}: {}".format(href, e))
+            errors.append({"href": href, "error": str(e)})
+
+    all_samples = [m for group in samples.values() for m in group]
+    overall = _mean(all_samples)
+
+    counts: Dict[str, int] = defaultdict(int)
+    for href in scenes:
+        counts[groups_of[href]] += 1
+
+    groups = {}
+    totals: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(
+        float))
+    for group, count in sorted(counts.items()):
+        per_scene = _mean(samples[group]) if samples[group] else overall
+        total = {
+            phase: {k: round(v * count, 3)
+                    for k, v in values.items()}
+            for phase, values in per_scene.items()
+        }
+        for phase, values in total.items():
+            for k, v in values.items():
+                totals[phase][k] += v
+        groups[group] = {
+            "scenes": count,
+            "sampled": len(samples[group]),
+            "per_scene": per_scene,
+            "total": total,
+        }
+
+    return {
+        "scenes": len(scenes),
+        "sampled": len(all_samples),
+        "options": dict(kwargs, cache_block_size=cache_block_size),
+        "scope": SCOPE,
+        "groups": groups,
+        "total": {
+            phase: {k: round(v, 3)
+                    for k, v in values.items()}
+            for phase, values in totals.items()
+        },
+        "errors": errors,
+    }
+
+
+def _mean(
+    measurements: List[Dict[str, Dict[str, float]]]
+) -> Dict[str, Dict[str, float]]:
+    if not measurements:
+        return {}
+    return {
+        phase: {
+            k: round(sum(m[phase][k] for m in measurements) / len(measurements),
+                     3)
+            for k in values
+        }
+        for phase, values in measurements[0].items()
+    }
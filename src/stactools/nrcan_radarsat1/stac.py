@@ -1,15 +1,25 @@
 from datetime import datetime
+import json
 import logging
-from typing import Optional
+from collections import deque
+from concurrent.futures import (FIRST_COMPLETED, Future, ThreadPoolExecutor,
+                                wait)
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
 import pystac
 from pystac.collection import Summaries
 from pystac.extensions.projection import ProjectionExtension
 from pystac.extensions.sat import OrbitState, SatExtension
 from pystac.extensions.sar import SarExtension
-from pystac.extensions.raster import RasterExtension
+from pystac.extensions.raster import (DataType, Histogram, RasterBand,
+                                      RasterExtension, Statistics)
+from shapely.geometry import mapping, shape
+from shapely.ops import unary_union
 
 from stactools.nrcan_radarsat1 import constants as c
-from stactools.nrcan_radarsat1.utils import Rsat_Metadata
+from stactools.nrcan_radarsat1.cache import BlockCache
+from stactools.nrcan_radarsat1.storage import Storage, get_storage, join_href
+from stactools.nrcan_radarsat1.utils import Rsat_Metadata, render_thumbnail
 
 logger = logging.getLogger(__name__)
 
@@ -56,13 +66,33 @@ def create_collection(json_path: Optional[str] = None) -> pystac.Collection:
     return collection
 
 
-def create_item(cog_href: str) -> pystac.Item:
+def create_item(cog_href: str,
+                cache: Optional[BlockCache] = None,
+                statistics: bool = False,
+                footprint_scale: int = 2,
+                storage: Optional[Storage] = None,
+                thumbnail_dir: Optional[str] = None,
+                thumbnail_format: str = "png",
+                thumbnail_storage: Optional[Storage] = None,
+                endpoint_url: Optional[str] = None) -> pystac.Item:
     """Creates a STAC item for a RADARSAT-1 COG image.
 
     Args:
         cog_href (str): Location of associated COG asset
         href url should point to radarsat-1 data in s3 storage,
         e.g. "s3://radarsat-r1-l1-cog/2009/2/RS1_X0597984_F1_20090205_094341_HH_SGF.tif"
+        cache (BlockCache): Optional local block cache the COG is read through
+        statistics (bool): Record scene statistics computed from the footprint read
+        footprint_scale (int): Subsampling of the band read for the footprint
+        (1,2,4,8,16). Higher is faster and less precise.
+        storage (Storage): Optional storage backend the COG is read from
+        thumbnail_dir (str): If set, write a dB-scaled thumbnail, made from the
+        footprint read, to this directory or prefix and add it as an asset
+        thumbnail_format (str): "png" or "webp"
+        thumbnail_storage (Storage): Storage backend of thumbnail_dir.
+        Default: by href scheme.
+        endpoint_url (str): S3-compatible endpoint of s3:// COG hrefs. If set and
+        storage is not, the COG is read through the storage backend for its href.
 
     Returns:
         pystac.Item: STAC Item object.
@@ -71,7 +101,17 @@ def create_item(cog_href: str) -> pystac.Item:
     item_id = cog_href.split('/')[-1][:-4]
     title = item_id
 
-    rsat_metadata = Rsat_Metadata(href=cog_href)
+    thumbnail_size = None
+    if thumbnail_dir is not None:
+        thumbnail_size = c.RADARSAT_THUMBNAIL_SIZE
+
+    rsat_metadata = Rsat_Metadata(href=cog_href,
+                                  cache=cache,
+                                  statistics=statistics,
+                                  footprint_scale=footprint_scale,
+                                  storage=storage,
+                                  thumbnail_size=thumbnail_size,
+                                  endpoint_url=endpoint_url)
 
     properties = {
         "title": title,
@@ -127,8 +167,8 @@ def create_item(cog_href: str) -> pystac.Item:
     # PROJECTION https://github.com/stac-extensions/projection
     projection = ProjectionExtension.ext(item, add_if_missing=True)
     projection.epsg = rsat_metadata.epsg
-    projection.transform = rsat_metadata.meta['transform']
-    projection.shape = rsat_metadata.meta['shape']
+    projection.transform = list(rsat_metadata.meta['transform'])[:6]
+    projection.shape = list(rsat_metadata.meta['shape'])
 
     item.add_asset(
         "cog",
@@ -140,6 +180,272 @@ def create_item(cog_href: str) -> pystac.Item:
         ),
     )
 
+    thumbnail = rsat_metadata.thumbnail
+    if thumbnail_dir is not None and thumbnail is not None:
+        driver, media_type = c.RADARSAT_THUMBNAIL_FORMATS[thumbnail_format]
+        thumbnail_href = join_href(
+            thumbnail_dir, "{}_thumbnail.{}".format(item_id, thumbnail_format))
+        if thumbnail_storage is None:
+            thumbnail_storage = get_storage(thumbnail_href)
+        thumbnail_storage.write(
+            thumbnail_href, render_thumbnail(thumbnail, driver))
+        item.add_asset(
+            "thumbnail",
+            pystac.Asset(
+                href=thumbnail_href,
+                media_type=media_type,
+                roles=["thumbnail"],
+                title="{} thumbnail".format(title),
+            ),
+        )
+
+    # RASTER https://github.com/stac-extensions/raster
+    stats = rsat_metadata.statistics
+    if stats is not None:
+        _add_statistics(item, rsat_metadata.meta['dtype'], stats)
+
     item.links.append(c.RADARSAT_LICENSE_LINK)
 
     return item
+
+
+def create_orbit_segment_item(items: List[pystac.Item]) -> pystac.Item:
+    """Creates a STAC item covering all scenes of one pass, so that spatial
+    searches match one record per pass instead of every scene.
+
+    Scenes are listed by id in nrcan-radarsat1:scenes, and linked as
+    derived_from only if they have a self href, i.e. were saved as json files.
+    Scenes written to NDJSON have no file of their own to link to.
+
+    Args:
+        items: Scene items of one absolute orbit and day, e.g. a run of orbit_runs
+
+    Returns:
+        pystac.Item: STAC Item with the merged footprint of the scenes, spanning
+        their acquisition times and linking to them as derived_from
+
+    Raises:
+        ValueError: if the items are not of one absolute orbit and day
+    """
+    if not items:
+        raise ValueError("No items to create an orbit segment from")
+    orbits = {SatExtension.ext(item).absolute_orbit for item in items}
+    if len(orbits) != 1 or None in orbits:
+        raise ValueError("Items are not of one absolute orbit: {}".format(
+            sorted(str(orbit) for orbit in orbits)))
+    orbit = orbits.pop()
+    times = sorted(item.datetime for item in items if item.datetime)
+    if not times or times[0].date() != times[-1].date():
+        raise ValueError("Items of orbit {} are not of one day".format(orbit))
+
+    # simplify(0) drops the collinear vertices left where footprints meet
+    footprint = unary_union([shape(item.geometry)
+                             for item in items]).simplify(0)
+    date = times[0].strftime("%Y%m%d")
+
+    item = pystac.Item(
+        id=c.RADARSAT_ORBIT_SEGMENT_ID.format(orbit=orbit, date=date),
+        # Lists, not the tuples of mapping, like geometries read from json
+        geometry=json.loads(json.dumps(mapping(footprint))),
+        bbox=[round(float(x), 5) for x in footprint.bounds],
+        datetime=None,
+        start_datetime=times[0],
+        end_datetime=times[-1],
+        properties={
+            "title": "RADARSAT-1 orbit {} on {}".format(orbit, date),
+            "description": "Footprint of {} scenes of one pass".format(
+                len(items)),
+            c.RADARSAT_SCENES: [scene.id for scene in items],
+        },
+        stac_extensions=[SatExtension.get_schema_uri()],
+    )
+
+    item.common_metadata.constellation = c.RADARSAT_CONSTELLATION
+    item.common_metadata.platform = c.RADARSAT_PLATFORM
+    item.common_metadata.instruments = c.RADARSAT_INSTRUMENTS
+    item.common_metadata.created = datetime.utcnow()
+
+    sat = SatExtension.ext(item, add_if_missing=True)
+    sat.absolute_orbit = orbit
+    orbit_states = {SatExtension.ext(scene).orbit_state for scene in items}
+    if len(orbit_states) == 1:
+        sat.orbit_state = orbit_states.pop()
+
+    for scene in items:
+        # Scenes only have a location once written, e.g. by save_items
+        scene_href = scene.get_self_href()
+        if scene_href is not None:
+            item.add_link(
+                pystac.Link(rel="derived_from",
+                            target=scene_href,
+                            media_type=pystac.MediaType.JSON,
+                            title=scene.id))
+
+    item.links.append(c.RADARSAT_LICENSE_LINK)
+
+    return item
+
+
+class ItemCreationError(Exception):
+    """A STAC Item could not be created for a COG"""
+    def __init__(self, href: str, error: Exception):
+        super().__init__("Could not create item for {}: {}".format(href, error))
+        self.href = href
+        self.error = error
+
+
+def iter_items(hrefs: Iterable[str],
+               concurrency: int = 8,
+               ordered: bool = False,
+               **kwargs: Any) -> Iterator[Union[pystac.Item, ItemCreationError]]:
+    """Creates STAC items for many COGs concurrently, yielding each as it completes.
+
+    At most `concurrency` items are in flight and hrefs are consumed lazily, so
+    a slow consumer (e.g. a database writer) holds back item creation instead
+    of results piling up in memory.
+
+    Args:
+        hrefs: Locations of COG assets. Can be a lazy iterable.
+        concurrency (int): Maximum number of items created at the same time
+        ordered (bool): Yield items in the order of hrefs rather than as they complete
+        kwargs: Options passed to create_item
+
+    Returns:
+        Iterator of pystac.Item, or ItemCreationError for COGs that failed
+    """
+    hrefs = iter(hrefs)
+
+    def _result(href: str,
+                future: Future) -> Union[pystac.Item, ItemCreationError]:
+        try:
+            return future.result()
+        except Exception as e:
+            return ItemCreationError(href, e)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+
+        def _submit(href: str) -> Future:
+            return executor.submit(create_item, href, **kwargs)
+
+        if ordered:
+            queue = deque((href, _submit(href))
+                          for href in islice(hrefs, concurrency))
+            try:
+                while queue:
+                    href, future = queue.popleft()
+                    result = _result(href, future)
+                    for next_href in islice(hrefs, 1):
+                        queue.append((next_href, _submit(next_href)))
+                    yield result
+            finally:
+                for _, future in queue:
+                    future.cancel()
+        else:
+            futures = {
+                _submit(href): href
+                for href in islice(hrefs, concurrency)
+            }
+            try:
+                while futures:
+                    done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        href = futures.pop(future)
+                        for next_href in islice(hrefs, 1):
+                            futures[_submit(next_href)] = next_href
+                        yield _result(href, future)
+            finally:
+                for future in futures:
+                    future.cancel()
+
+
+def save_items(items: Iterable[pystac.Item],
+               destination: str,
+               storage: Optional[Storage] = None,
+               max_workers: int = 16) -> int:
+    """Writes STAC Items as <destination>/<item id>.json, concurrently and in
+    batches, to a local directory or object storage prefix.
+
+    Args:
+        items: STAC Items to write
+        destination (str): Directory or prefix, e.g. "s3://bucket/items"
+        storage (Storage): Storage backend of destination. Default: by href scheme.
+        max_workers (int): Number of concurrent writes
+
+    Returns:
+        int: Number of items written
+    """
+    if storage is None:
+        storage = get_storage(destination)
+
+    def _objects():
+        for item in items:
+            href = join_href(destination, "{}.json".format(item.id))
+            item.set_self_href(href)
+            yield href, json.dumps(item.to_dict()).encode()
+
+    return storage.write_many(_objects(), max_workers=max_workers)
+
+
+def write_ndjson(items: Iterable[pystac.Item],
+                 href: str,
+                 storage: Optional[Storage] = None,
+                 chunk_size: int = 1024 * 1024) -> int:
+    """Writes STAC Items to a single newline delimited JSON file, streamed to
+    the storage in chunks so that only one chunk of items is held in memory.
+
+    Args:
+        items: STAC Items to write
+        href (str): Path or url of the NDJSON file
+        storage (Storage): Storage backend of href. Default: by href scheme.
+        chunk_size (int): Approximate size in bytes of the chunks written
+
+    Returns:
+        int: Number of items written
+    """
+    if storage is None:
+        storage = get_storage(href)
+
+    count = 0
+
+    def _chunks() -> Iterator[bytes]:
+        nonlocal count
+        chunk = bytearray()
+        for item in items:
+            chunk += json.dumps(item.to_dict(include_self_link=False)).encode()
+            chunk += b"\n"
+            count += 1
+            if len(chunk) >= chunk_size:
+                yield bytes(chunk)
+                chunk.clear()
+        if chunk:
+            yield bytes(chunk)
+
+    storage.write_stream(href, _chunks())
+    return count
+
+
+def _add_statistics(item: pystac.Item, dtype: str,
+                    stats: Dict[str, Any]) -> None:
+    """Records scene statistics on the cog asset (raster:bands) and, for fields
+    the raster extension has no place for, as item properties.
+    """
+    band = RasterBand.create(nodata=0, data_type=DataType(dtype))
+    if 'mean' in stats:
+        band.statistics = Statistics.create(
+            minimum=stats['minimum'],
+            maximum=stats['maximum'],
+            mean=stats['mean'],
+            stddev=stats['stddev'],
+            valid_percent=round(stats['valid_fraction'] * 100, 2),
+        )
+        band.histogram = Histogram.create(**stats['histogram'])
+        item.properties[c.RADARSAT_PERCENTILES] = stats['percentiles']
+        item.properties[c.RADARSAT_MEAN_DB] = stats['mean_db']
+    else:
+        band.statistics = Statistics.create(valid_percent=0.0)
+
+    raster = RasterExtension.ext(item.assets["cog"], add_if_missing=True)
+    raster.bands = [band]
+
+    item.properties[c.RADARSAT_VALID_FRACTION] = stats['valid_fraction']
+    item.properties[c.RADARSAT_NODATA_FRACTION] = stats['nodata_fraction']
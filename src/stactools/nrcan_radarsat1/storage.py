@@ -0,0 +1,521 @@
+import io
+import logging
+import os
+import shutil
+import urllib.request
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import chain, islice
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlparse
+
+import boto3
+import fsspec
+from botocore import UNSIGNED
+from botocore.config import Config
+
+logger = logging.getLogger(__name__)
+
+# S3 multipart uploads need parts of at least 5MB, except the last one
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+
+# GDAL reads COG headers and tiles in small pieces: files opened on a storage
+# fetch aligned blocks of this size and keep the most recent ones in memory
+DEFAULT_READ_BLOCK_SIZE = 512 * 1024
+DEFAULT_READ_BLOCKS = 32
+
+
+class ReadOnlyStorageError(PermissionError):
+    """Raised when writing to a storage backend that can only be read"""
+
+
+class ObjectInfo(NamedTuple):
+    """Size and version of a stored object"""
+    size: int
+    # ETag or last modification time, None if the backend reports neither
+    version: Optional[str]
+
+
+class Storage(ABC):
+    """
+    Storage backend used for COG reads, downloads and item writes
+    """
+    # Endpoint hrefs are resolved against, if the scheme alone does not tell
+    endpoint_url: Optional[str] = None
+
+    @abstractmethod
+    def size(self, href: str) -> int:
+        """
+        Size in bytes of the object at href
+        """
+
+    def info(self, href: str) -> ObjectInfo:
+        """
+        Size and version of the object at href, telling a replaced object apart
+        """
+        return ObjectInfo(self.size(href), None)
+
+    @abstractmethod
+    def read_range(self, href: str, start: int, end: int) -> bytes:
+        """
+        Read bytes [start, end) of the object at href
+        """
+
+    @abstractmethod
+    def write(self, href: str, data: bytes) -> None:
+        """
+        Write data to href, replacing any existing object
+        """
+
+    @abstractmethod
+    def write_stream(self, href: str, chunks: Iterable[bytes]) -> None:
+        """
+        Write chunks to href as they are produced, without holding the whole
+        object in memory, replacing any existing object
+        """
+
+    @abstractmethod
+    def list(self, prefix: str, suffix: str = "") -> List[str]:
+        """
+        List hrefs under prefix ending with suffix
+        """
+
+    def open(self, href: str, mode: str = "rb") -> "RangeFile":
+        """
+        Open href as a read-only file object reading byte ranges on demand,
+        in blocks of DEFAULT_READ_BLOCK_SIZE. Can be passed to rasterio.open
+        as opener.
+        """
+        return RangeFile(self, href, mode, block_size=DEFAULT_READ_BLOCK_SIZE)
+
+    def download(self, href: str, out_file: str) -> None:
+        """
+        Copy the object at href to the local file out_file
+        """
+        with self.open(href) as src, open(out_file, "wb") as f:
+            shutil.copyfileobj(src, f, 8 * 1024 * 1024)
+
+    def write_many(self,
+                   objects: Iterable[Tuple[str, bytes]],
+                   max_workers: int = 16,
+                   batch_size: int = 256) -> int:
+        """
+        Write (href, data) pairs concurrently, a batch at a time so that only
+        batch_size objects are held in memory.
+
+        Returns:
+            number of objects written
+        """
+        objects = iter(objects)
+        written = 0
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for batch in iter(lambda: list(islice(objects, batch_size)), []):
+                list(executor.map(lambda obj: self.write(*obj), batch))
+                written += len(batch)
+        return written
+
+
+class LocalStorage(Storage):
+    """
+    Local file system
+    """
+    def size(self, href: str) -> int:
+        return os.path.getsize(_local_path(href))
+
+    def info(self, href: str) -> ObjectInfo:
+        stat = os.stat(_local_path(href))
+        return ObjectInfo(stat.st_size, str(stat.st_mtime_ns))
+
+    def read_range(self, href: str, start: int, end: int) -> bytes:
+        with open(_local_path(href), "rb") as f:
+            f.seek(start)
+            return f.read(end - start)
+
+    def write(self, href: str, data: bytes) -> None:
+        self.write_stream(href, [data])
+
+    def write_stream(self, href: str, chunks: Iterable[bytes]) -> None:
+        path = _local_path(href)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+
+    def list(self, prefix: str, suffix: str = "") -> List[str]:
+        prefix = _local_path(prefix)
+        return sorted(
+            os.path.join(root, f) for root, _, files in os.walk(prefix)
+            for f in files if f.lower().endswith(suffix.lower()))
+
+    def open(self, href: str, mode: str = "rb"):
+        return open(_local_path(href), mode)
+
+    def download(self, href: str, out_file: str) -> None:
+        shutil.copyfile(_local_path(href), out_file)
+
+
+class S3Storage(Storage):
+    """
+    AWS S3 or an S3-compatible endpoint (e.g. an in-region mirror or MinIO).
+    Requests are unsigned when no AWS credentials are configured.
+    """
+    def __init__(self,
+                 endpoint_url: Optional[str] = None,
+                 anonymous: Optional[bool] = None):
+        """
+        Args:
+        endpoint_url: url of an S3-compatible endpoint, default AWS
+        anonymous: send unsigned requests. Default: only without credentials.
+        """
+        self.endpoint_url = endpoint_url
+        if anonymous is None:
+            anonymous = boto3.Session().get_credentials() is None
+        config = Config(signature_version=UNSIGNED) if anonymous else None
+        self.client = boto3.client("s3",
+                                   endpoint_url=endpoint_url,
+                                   config=config)
+        self.part_size = DEFAULT_PART_SIZE
+
+    def size(self, href: str) -> int:
+        return self.info(href).size
+
+    def info(self, href: str) -> ObjectInfo:
+        bucket, key = _split_s3_href(href)
+        head = self.client.head_object(Bucket=bucket, Key=key)
+        version = head.get("ETag") or head.get("LastModified")
+        return ObjectInfo(head["ContentLength"],
+                          None if version is None else str(version))
+
+    def read_range(self, href: str, start: int, end: int) -> bytes:
+        bucket, key = _split_s3_href(href)
+        response = self.client.get_object(Bucket=bucket,
+                                          Key=key,
+                                          Range="bytes={}-{}".format(
+                                              start, end - 1))
+        return response["Body"].read()
+
+    def write(self, href: str, data: bytes) -> None:
+        bucket, key = _split_s3_href(href)
+        self.client.put_object(Bucket=bucket, Key=key, Body=data)
+
+    def write_stream(self, href: str, chunks: Iterable[bytes]) -> None:
+        parts = _iter_parts(chunks, self.part_size)
+        first = next(parts, b"")
+        second = next(parts, None)
+        if second is None:
+            # Small enough for a single request
+            self.write(href, first)
+            return
+
+        bucket, key = _split_s3_href(href)
+        upload_id = self.client.create_multipart_upload(
+            Bucket=bucket, Key=key)["UploadId"]
+        try:
+            uploaded = []
+            for number, part in enumerate(
+                    chain([first, second], parts), 1):
+                response = self.client.upload_part(Bucket=bucket,
+                                                   Key=key,
+                                                   UploadId=upload_id,
+                                                   PartNumber=number,
+                                                   Body=part)
+                uploaded.append({"ETag": response["ETag"], "PartNumber": number})
+            self.client.complete_multipart_upload(
+                Bucket=bucket,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": uploaded})
+        except BaseException:
+            self.client.abort_multipart_upload(Bucket=bucket,
+                                               Key=key,
+                                               UploadId=upload_id)
+            raise
+
+    def list(self, prefix: str, suffix: str = "") -> List[str]:
+        bucket, key_prefix = _split_s3_href(prefix)
+        paginator = self.client.get_paginator("list_objects_v2")
+        hrefs = []
+        for page in paginator.paginate(Bucket=bucket, Prefix=key_prefix):
+            for obj in page.get("Contents", []):
+                if obj["Key"].lower().endswith(suffix.lower()):
+                    hrefs.append("s3://{}/{}".format(bucket, obj["Key"]))
+        return hrefs
+
+    def download(self, href: str, out_file: str) -> None:
+        bucket, key = _split_s3_href(href)
+        # Multipart, concurrent transfer
+        self.client.download_file(bucket, key, out_file)
+
+
+class HTTPStorage(Storage):
+    """
+    Read-only access over HTTP(S) using range requests
+    """
+    def size(self, href: str) -> int:
+        return self.info(href).size
+
+    def info(self, href: str) -> ObjectInfo:
+        request = _http_request(href, method="HEAD")
+        with urllib.request.urlopen(request) as response:
+            headers = response.headers
+            return ObjectInfo(
+                int(headers["Content-Length"]),
+                headers.get("ETag") or headers.get("Last-Modified"))
+
+    def read_range(self, href: str, start: int, end: int) -> bytes:
+        request = _http_request(
+            href, headers={"Range": "bytes={}-{}".format(start, end - 1)})
+        with urllib.request.urlopen(request) as response:
+            data = response.read()
+            # Servers without range support return the whole file
+            if response.status == 200:
+                data = data[start:end]
+            return data
+
+    def write(self, href: str, data: bytes) -> None:
+        raise ReadOnlyStorageError("HTTP storage is read-only: {}".format(href))
+
+    def write_stream(self, href: str, chunks: Iterable[bytes]) -> None:
+        raise ReadOnlyStorageError("HTTP storage is read-only: {}".format(href))
+
+    def list(self, prefix: str, suffix: str = "") -> List[str]:
+        raise ValueError(
+            "HTTP prefixes can not be listed, use a manifest: {}".format(prefix))
+
+
+class FsspecStorage(Storage):
+    """
+    Any file system supported by fsspec (gs://, az://, memory://, ...)
+    """
+    def __init__(self, protocol: str, **storage_options):
+        """
+        Args:
+        protocol: fsspec protocol
+        storage_options: options passed to the fsspec file system
+        """
+        self.protocol = protocol
+        self.fs = fsspec.filesystem(protocol, **storage_options)
+
+    def size(self, href: str) -> int:
+        return self.fs.size(href)
+
+    def info(self, href: str) -> ObjectInfo:
+        info = self.fs.info(href)
+        # The key of the version differs per file system
+        for key in ("ETag", "etag", "LastModified", "last_modified", "mtime",
+                    "created"):
+            if info.get(key) is not None:
+                return ObjectInfo(info["size"], str(info[key]))
+        return ObjectInfo(info["size"], None)
+
+    def read_range(self, href: str, start: int, end: int) -> bytes:
+        return self.fs.cat_file(href, start=start, end=end)
+
+    def write(self, href: str, data: bytes) -> None:
+        self.fs.pipe_file(href, data)
+
+    def write_stream(self, href: str, chunks: Iterable[bytes]) -> None:
+        with self.fs.open(href, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+
+    def list(self, prefix: str, suffix: str = "") -> List[str]:
+        return sorted(
+            self._unstrip_protocol(path) for path in self.fs.find(prefix)
+            if path.lower().endswith(suffix.lower()))
+
+    def open(self, href: str, mode: str = "rb"):
+        return self.fs.open(href, mode)
+
+    def _unstrip_protocol(self, path: str) -> str:
+        if self.protocol in ("file", "local"):
+            return path
+        root_marker = self.fs.root_marker
+        if root_marker and path.startswith(root_marker):
+            path = path[len(root_marker):]
+        return "{}://{}".format(self.protocol, path)
+
+
+class RangeFile(io.RawIOBase):
+    """
+    Read-only, seekable file object over anything providing size and read_range,
+    i.e. a Storage or a BlockCache.
+
+    With a block_size, reads are served from aligned blocks kept in memory and
+    the blocks missing for a read are fetched with one read_range per run of
+    consecutive blocks, so that the many small reads GDAL makes turn into a
+    few requests.
+    """
+    def __init__(self,
+                 source,
+                 href: str,
+                 mode: str = "rb",
+                 block_size: Optional[int] = None,
+                 max_blocks: int = DEFAULT_READ_BLOCKS):
+        if "r" not in mode or "+" in mode or "w" in mode:
+            raise ValueError(
+                "Only reading is supported, not mode '{}'".format(mode))
+        self.source = source
+        self.href = href
+        self.name = href
+        self.block_size = block_size
+        self.max_blocks = max_blocks
+        self._pos = 0
+        self._blocks: "OrderedDict[int, bytes]" = OrderedDict()
+        # Looked up now so that a missing or unreachable file fails the open.
+        # Raised later, from GDAL's seek callback, it aborts the process.
+        self._size = source.size(href)
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self._pos = offset
+        elif whence == io.SEEK_CUR:
+            self._pos += offset
+        elif whence == io.SEEK_END:
+            self._pos = self.size + offset
+        else:
+            raise ValueError("Invalid whence ({})".format(whence))
+        return self._pos
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        if size is None or size < 0:
+            end = self.size
+        else:
+            end = min(self._pos + size, self.size)
+        if self._pos >= end:
+            return b""
+        if self.block_size is None:
+            data = self.source.read_range(self.href, self._pos, end)
+        else:
+            data = self._read_blocks(self._pos, end)
+        self._pos += len(data)
+        return data
+
+    def readall(self) -> bytes:
+        return self.read(-1)
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def _read_blocks(self, start: int, end: int) -> bytes:
+        assert self.block_size is not None
+        first = start // self.block_size
+        last = (end - 1) // self.block_size
+        indexes = range(first, last + 1)
+        blocks = {i: self._blocks[i] for i in indexes if i in self._blocks}
+
+        missing = [i for i in indexes if i not in blocks]
+        while missing:
+            run = 1
+            while run < len(missing) and missing[run] == missing[0] + run:
+                run += 1
+            run_start = missing[0] * self.block_size
+            run_end = min((missing[0] + run) * self.block_size, self.size)
+            data = self.source.read_range(self.href, run_start, run_end)
+            for n, i in enumerate(missing[:run]):
+                blocks[i] = data[n * self.block_size:(n + 1) *
+                                 self.block_size]
+            missing = missing[run:]
+
+        for i in indexes:
+            self._blocks[i] = blocks[i]
+            self._blocks.move_to_end(i)
+        while len(self._blocks) > self.max_blocks:
+            self._blocks.popitem(last=False)
+
+        data = b"".join(blocks[i] for i in indexes)
+        offset = start - first * self.block_size
+        return data[offset:offset + end - start]
+
+
+@lru_cache(maxsize=None)
+def _get_storage(scheme: str, endpoint_url: Optional[str],
+                 use_fsspec: bool) -> Storage:
+    if use_fsspec:
+        return FsspecStorage(scheme or "file")
+    elif scheme in ("", "file"):
+        return LocalStorage()
+    elif scheme == "s3":
+        return S3Storage(endpoint_url=endpoint_url)
+    elif scheme in ("http", "https"):
+        return HTTPStorage()
+    return FsspecStorage(scheme)
+
+
+def get_storage(href: str,
+                endpoint_url: Optional[str] = None,
+                use_fsspec: bool = False) -> Storage:
+    """
+    Return the storage backend for an href, shared for the process lifetime
+
+    Args:
+        href (str): local path or url (s3://, http(s)://, or any fsspec protocol)
+        endpoint_url (str): url of an S3-compatible endpoint for s3:// hrefs
+        use_fsspec (bool): use fsspec whatever the scheme
+
+    Returns:
+        Storage
+    """
+    scheme = urlparse(href).scheme
+    # Windows drive letters parse as a scheme
+    if len(scheme) == 1:
+        scheme = ""
+    return _get_storage(scheme, endpoint_url, use_fsspec)
+
+
+def join_href(prefix: str, name: str) -> str:
+    """
+    Join a file name to a local directory or url prefix
+    """
+    if "://" in prefix:
+        return "{}/{}".format(prefix.rstrip("/"), name)
+    return os.path.join(prefix, name)
+
+
+def _http_request(href: str, **kwargs) -> urllib.request.Request:
+    try:
+        return urllib.request.Request(href, **kwargs)
+    except ValueError:
+        raise FileNotFoundError(href)
+
+
+def _iter_parts(chunks: Iterable[bytes], part_size: int) -> Iterator[bytes]:
+    """
+    Regroup chunks into parts of at least part_size bytes, except the last
+    """
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        if len(buffer) >= part_size:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+def _local_path(href: str) -> str:
+    if href.startswith("file://"):
+        return urlparse(href).path
+    return href
+
+
+def _split_s3_href(href: str) -> Tuple[str, str]:
+    parsed = urlparse(href)
+    return parsed.netloc, parsed.path.lstrip("/")
@@ -1,32 +1,58 @@
 from stactools.nrcan_radarsat1 import sat_properties
+from stactools.nrcan_radarsat1.cache import BlockCache
+from stactools.nrcan_radarsat1.storage import Storage, get_storage
 import os
+import shutil
+import warnings
 import datetime
-from typing import Optional
+from functools import lru_cache
+from numbers import Number
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 import logging
 import numpy as np
+from numpy.typing import ArrayLike
 import rasterio
 import rasterio.features
 from rasterio import Affine as A
-from rasterio.warp import transform_geom
+from rasterio.errors import NotGeoreferencedWarning
+from rasterio.io import MemoryFile
+from pyproj import Transformer
 from shapely.geometry import mapping, shape
 import utm
-import boto3
-from botocore import UNSIGNED
-from botocore.config import Config
 
 logger = logging.getLogger(__name__)
 
+MANIFEST_EXTENSIONS = (".txt", ".csv", ".lst")
+
 
 class Rsat_Metadata():
     """
     Metadata class for Radarsat-1
     """
-    def __init__(self, href):
+    def __init__(self,
+                 href,
+                 cache: Optional[BlockCache] = None,
+                 statistics: bool = False,
+                 footprint_scale: int = 2,
+                 storage: Optional[Storage] = None,
+                 thumbnail_size: Optional[int] = None,
+                 endpoint_url: Optional[str] = None):
         """
         Args:
         href: path to cog file. Can be aws link or path to local file.
+        cache: optional BlockCache through which the COG is read
+        statistics: compute scene statistics from the band read for the footprint
+        footprint_scale: subsampling of the band read for the footprint (1,2,4,8,16)
+        storage: optional Storage backend the COG is read from. By default
+        GDAL reads the href directly.
+        thumbnail_size: if set, make a dB-scaled thumbnail of at most this many
+        pixels per side from the band read for the footprint
+        endpoint_url: S3-compatible endpoint of s3:// hrefs. If set and storage
+        is not, the COG is read through the storage backend for its href.
         """
         self.href = href
+        if storage is None and endpoint_url is not None:
+            storage = get_storage(href, endpoint_url=endpoint_url)
 
         def _load_metadata_from_asset():
             """
@@ -35,7 +61,12 @@ class Rsat_Metadata():
 
             with rasterio.Env(AWS_NO_SIGN_REQUEST='YES',
                               GDAL_DISABLE_READDIR_ON_OPEN='EMPTY_DIR'):
-                with rasterio.open(href) as src:
+                opener = None
+                if cache is not None:
+                    opener = cache.open
+                elif storage is not None:
+                    opener = storage.open
+                with rasterio.open(href, opener=opener) as src:
                     # Retrieve metadata stored in COG file
                     metadata = src.profile
                     metadata.update(src.tags())
@@ -45,12 +76,14 @@ class Rsat_Metadata():
                     # accessed via the .crs method. If this occurs assume it is in WGS84.
                     # All COGs in AWS appear to be projected in WGS84.
                     if src.crs is None:
-                        metadata['crs'] = rasterio.crs.CRS.from_epsg(4326)
+                        metadata['crs'] = get_crs(4326)
                     else:
                         metadata['crs'] = src.crs
+                    metadata['epsg'] = metadata['crs'].to_epsg()
 
                     # Compute bounding box, image footprint, and gsd
-                    bbox, footprint, metadata = _get_geometries(src, metadata)
+                    bbox, footprint, metadata = _get_geometries(
+                        src, metadata, scale=footprint_scale)
 
                 # Derive some additional metadata from the filename
                 fname = os.path.basename(href)
@@ -74,8 +107,10 @@ class Rsat_Metadata():
             """
 
             # Get bounding box for raster in Lat/Long
-            with rasterio.vrt.WarpedVRT(src, crs='EPSG:4326') as vrt:
-                bbox = [np.round(x, decimals=precision) for x in vrt.bounds]
+            with rasterio.vrt.WarpedVRT(src, crs=get_crs(4326)) as vrt:
+                bbox = [
+                    float(np.round(x, decimals=precision)) for x in vrt.bounds
+                ]
                 metadata['transform'] = vrt.transform
 
             # Get GSD in meters. Requires conversion to UTM. Appropriate UTM zone determined
@@ -85,15 +120,9 @@ class Rsat_Metadata():
             mid_long = bbox[0] + ((bbox[2] - bbox[0]) / 2)
             utm_zone = utm.latlon_to_zone_number(mid_lat, mid_long)
             south = True if mid_lat < 0.0 else False
-            utm_crs = rasterio.crs.CRS.from_dict({
-                'proj': 'utm',
-                'zone': utm_zone,
-                'south': south
-            })
-            utm_epsg = utm_crs.to_authority()[1]
-
-            with rasterio.vrt.WarpedVRT(
-                    src, crs='EPSG:{}'.format(utm_epsg)) as utm_vrt:
+            utm_epsg = get_utm_epsg(utm_zone, south)
+
+            with rasterio.vrt.WarpedVRT(src, crs=get_crs(utm_epsg)) as utm_vrt:
                 gsd = utm_vrt.transform[0]
                 metadata['gsd'] = round(gsd, 2)
 
@@ -101,6 +130,10 @@ class Rsat_Metadata():
             # This might be a bit heavy of an operation. Could just use the bounds for geometry
             arr = src.read(1,
                            out_shape=(src.height // scale, src.width // scale))
+            if statistics:
+                metadata['statistics'] = get_statistics(arr)
+            if thumbnail_size is not None:
+                metadata['thumbnail'] = get_thumbnail(arr, thumbnail_size)
             arr[np.where(arr != 0)] = 1
             transform = src.transform * A.scale(scale)
 
@@ -116,11 +149,10 @@ class Rsat_Metadata():
 
             valid_geom = mapping(max_geometry.convex_hull)
 
-            footprint = transform_geom("EPSG:4326",
-                                       "EPSG:{}".format(
-                                           metadata['crs'].to_epsg()),
-                                       valid_geom,
-                                       precision=precision)
+            footprint = transform_geoms([valid_geom],
+                                        4326,
+                                        metadata['epsg'],
+                                        precision=precision)[0]
 
             return bbox, footprint, metadata
 
@@ -161,7 +193,17 @@ class Rsat_Metadata():
     @property
     def epsg(self) -> Optional[int]:
         '''returns image epsg code'''
-        return self.meta['crs'].to_epsg()
+        return self.meta['epsg']
+
+    @property
+    def statistics(self) -> Optional[Dict[str, Any]]:
+        '''returns scene statistics, if computed'''
+        return self.meta.get('statistics')
+
+    @property
+    def thumbnail(self) -> Optional[np.ndarray]:
+        '''returns the dB-scaled thumbnail array, if made'''
+        return self.meta.get('thumbnail')
 
     @property
     def orbit_state(self) -> Optional[str]:
@@ -184,7 +226,258 @@ class Rsat_Metadata():
         return round(float(self.meta['CEOS_LINE_SPACING_METERS'].strip()), 2)
 
 
-def download_asset(cog_href: str, outpath: str) -> Optional[str]:
+def get_statistics(arr: np.ndarray,
+                   nodata: float = 0,
+                   bins: int = 256,
+                   percentiles: Tuple[int, ...] = (2, 25, 50, 75, 98)
+                   ) -> Dict[str, Any]:
+    """
+    Compute per-scene statistics of a (decimated) band
+
+    Args:
+        arr (np.ndarray): band values
+        nodata (float): value of pixels outside the valid data region
+        bins (int): number of histogram buckets
+        percentiles: percentiles of the valid pixel values to report
+
+    Returns:
+        dict with valid and nodata fractions, minimum, maximum, mean, stddev,
+        percentiles, histogram, and mean backscatter in dB
+        (10 * log10 of the mean of the squared digital numbers; uncalibrated)
+    """
+    valid = arr[arr != nodata].astype(np.float64)
+    valid_fraction = valid.size / arr.size if arr.size else 0.0
+    stats: Dict[str, Any] = {
+        'valid_fraction': round(valid_fraction, 4),
+        'nodata_fraction': round(1.0 - valid_fraction, 4),
+    }
+    if valid.size == 0:
+        return stats
+
+    minimum = float(valid.min())
+    maximum = float(valid.max())
+    buckets, _ = np.histogram(valid, bins=bins, range=(minimum, maximum))
+    stats.update({
+        'minimum': minimum,
+        'maximum': maximum,
+        'mean': round(float(valid.mean()), 4),
+        'stddev': round(float(valid.std()), 4),
+        'percentiles': {
+            'p{}'.format(p): float(v)
+            for p, v in zip(percentiles, np.percentile(valid, percentiles))
+        },
+        'histogram': {
+            'count': bins,
+            'min': minimum,
+            'max': maximum,
+            'buckets': buckets.tolist(),
+        },
+        'mean_db': round(float(10 * np.log10(np.mean(valid**2))), 2),
+    })
+    return stats
+
+
+def get_thumbnail(arr: np.ndarray, size: int, nodata: float = 0) -> np.ndarray:
+    """
+    Make a dB-scaled 8 bit thumbnail of a (decimated) band
+
+    Args:
+        arr (np.ndarray): band values
+        size (int): maximum number of pixels per side
+        nodata (float): value of pixels outside the valid data region
+
+    Returns:
+        np.ndarray: uint8 array with 0 for nodata and backscatter in dB,
+        stretched between its 2nd and 98th percentiles, in 1-255
+    """
+    step = max(1, int(np.ceil(max(arr.shape) / size)))
+    small = arr[::step, ::step]
+    valid = small != nodata
+
+    out = np.zeros(small.shape, dtype=np.uint8)
+    if not valid.any():
+        return out
+
+    db = 20 * np.log10(small[valid].astype(np.float64))
+    low, high = np.percentile(db, (2, 98))
+    scaled = np.clip((db - low) / max(high - low, 1e-6), 0, 1)
+    out[valid] = np.round(scaled * 254 + 1).astype(np.uint8)
+    return out
+
+
+def render_thumbnail(thumbnail: np.ndarray, driver: str = "PNG") -> bytes:
+    """
+    Encode a thumbnail array as an image, with nodata transparent
+
+    Args:
+        thumbnail (np.ndarray): uint8 array from get_thumbnail
+        driver (str): GDAL driver of the image format, "PNG" or "WEBP"
+
+    Returns:
+        bytes: encoded image
+    """
+    alpha = np.where(thumbnail > 0, 255, 0).astype(np.uint8)
+    if driver == "WEBP":
+        # WEBP only supports RGB(A)
+        bands = np.stack([thumbnail, thumbnail, thumbnail, alpha])
+    else:
+        bands = np.stack([thumbnail, alpha])
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", NotGeoreferencedWarning)
+        with MemoryFile() as memfile:
+            with memfile.open(driver=driver,
+                              width=thumbnail.shape[1],
+                              height=thumbnail.shape[0],
+                              count=bands.shape[0],
+                              dtype="uint8") as dst:
+                dst.write(bands)
+            return memfile.read()
+
+
+@lru_cache(maxsize=None)
+def get_crs(epsg: int) -> rasterio.crs.CRS:
+    """
+    Return a rasterio CRS for an EPSG code, cached for the process lifetime
+
+    Args:
+        epsg (int): EPSG code
+
+    Returns:
+        rasterio.crs.CRS
+    """
+    return rasterio.crs.CRS.from_epsg(epsg)
+
+
+@lru_cache(maxsize=None)
+def get_utm_epsg(zone: int, south: bool) -> int:
+    """
+    Return the EPSG code of a WGS84 UTM zone, cached for the process lifetime
+
+    Args:
+        zone (int): UTM zone number
+        south (bool): True for the southern hemisphere zone
+
+    Returns:
+        EPSG code of the UTM zone
+    """
+    utm_crs = rasterio.crs.CRS.from_dict({
+        'proj': 'utm',
+        'zone': zone,
+        'south': south
+    })
+    return int(utm_crs.to_authority()[1])
+
+
+@lru_cache(maxsize=None)
+def get_transformer(src_epsg: int, dst_epsg: int) -> Transformer:
+    """
+    Return a pyproj Transformer between two EPSG codes, cached for the process lifetime.
+    Coordinates are always handled in x/y (long/lat) order.
+
+    Args:
+        src_epsg (int): EPSG code of the input coordinates
+        dst_epsg (int): EPSG code of the output coordinates
+
+    Returns:
+        pyproj.Transformer
+    """
+    return Transformer.from_crs(src_epsg, dst_epsg, always_xy=True)
+
+
+def transform_coords(xs: ArrayLike, ys: ArrayLike, src_epsg: int,
+                     dst_epsg: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Reproject arrays of coordinates in one vectorised call
+
+    Args:
+        xs: x (longitude) coordinates
+        ys: y (latitude) coordinates
+        src_epsg (int): EPSG code of the input coordinates
+        dst_epsg (int): EPSG code of the output coordinates
+
+    Returns:
+        Tuple of reprojected x and y arrays
+    """
+    xs = np.asarray(xs, dtype=float)
+    ys = np.asarray(ys, dtype=float)
+    if src_epsg == dst_epsg:
+        return xs, ys
+    return get_transformer(src_epsg, dst_epsg).transform(xs, ys)
+
+
+def transform_geoms(geoms: List[Dict[str, Any]],
+                    src_epsg: int,
+                    dst_epsg: int,
+                    precision: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Reproject a list of GeoJSON geometries (e.g. footprints of many items).
+    All coordinates are gathered and reprojected in a single vectorised call.
+
+    Args:
+        geoms: list of GeoJSON geometry dicts
+        src_epsg (int): EPSG code of the input geometries
+        dst_epsg (int): EPSG code of the output geometries
+        precision: number of decimals to round output coordinates to
+
+    Returns:
+        list of reprojected GeoJSON geometry dicts
+    """
+    leaves: List[np.ndarray] = []
+    for geom in geoms:
+        _collect_positions(geom['coordinates'], leaves)
+    if not leaves:
+        return [dict(geom) for geom in geoms]
+
+    positions = np.concatenate(leaves)
+    xs, ys = transform_coords(positions[:, 0], positions[:, 1], src_epsg,
+                              dst_epsg)
+    positions[:, 0] = xs
+    positions[:, 1] = ys
+    if precision is not None:
+        positions = np.round(positions, decimals=precision)
+
+    splits = np.cumsum([len(leaf) for leaf in leaves])[:-1]
+    transformed = iter(np.split(positions, splits))
+
+    out = []
+    for geom in geoms:
+        new_geom = dict(geom)
+        new_geom['coordinates'] = _rebuild_positions(geom['coordinates'],
+                                                     transformed)
+        out.append(new_geom)
+    return out
+
+
+def _collect_positions(coords: Any, leaves: List[np.ndarray]) -> None:
+    """
+    Append every sequence of positions found in GeoJSON coordinates to leaves
+    """
+    if isinstance(coords[0], Number):
+        leaves.append(np.asarray([coords], dtype=float))
+    elif isinstance(coords[0][0], Number):
+        leaves.append(np.asarray(coords, dtype=float))
+    else:
+        for part in coords:
+            _collect_positions(part, leaves)
+
+
+def _rebuild_positions(coords: Any, transformed: Iterator[np.ndarray]) -> Any:
+    """
+    Rebuild GeoJSON coordinates with the same nesting as coords from transformed positions
+    """
+    if isinstance(coords[0], Number):
+        return next(transformed)[0].tolist()
+    elif isinstance(coords[0][0], Number):
+        return next(transformed).tolist()
+    return [_rebuild_positions(part, transformed) for part in coords]
+
+
+def download_asset(cog_href: str,
+                   outpath: str,
+                   cache: Optional[BlockCache] = None,
+                   storage: Optional[Storage] = None,
+                   endpoint_url: Optional[str] = None) -> Optional[str]:
     """
     Download COG asset
 
@@ -193,27 +486,55 @@ def download_asset(cog_href: str, outpath: str) -> Optional[str]:
         href url should point to radarsat-1 data in s3 storage,
         e.g. "s3://radarsat-r1-l1-cog/2009/2/RS1_X0597984_F1_20090205_094341_HH_SGF.tif"
         outpath (str): Directory for outfile.
+        cache (BlockCache): Optional cache the asset is read through
+        storage (Storage): Storage backend to download from. Default: by href scheme.
+        endpoint_url (str): S3-compatible endpoint of s3:// hrefs, when storage is not set
 
     Returns:
         path to file
     """
 
-    import warnings
     warnings.simplefilter("ignore", ResourceWarning)
 
-    bucket_name = "radarsat-r1-l1-cog"
-
     if not os.path.exists(outpath):
         os.makedirs(outpath)
 
-    s3_fpath = cog_href.split(bucket_name)[1][1:]
     fname = os.path.basename(cog_href)
 
     out_file = os.path.join(outpath, fname)
 
-    s3 = boto3.client("s3", config=Config(signature_version=UNSIGNED))
+    if cache is not None:
+        with cache.open(cog_href) as src, open(out_file, 'wb') as f:
+            shutil.copyfileobj(src, f, cache.block_size)
+        return out_file
 
-    with open(out_file, 'wb') as f:
-        s3.download_fileobj(bucket_name, s3_fpath, f)
+    if storage is None:
+        storage = get_storage(cog_href, endpoint_url=endpoint_url)
+    storage.download(cog_href, out_file)
 
     return out_file
+
+
+def list_hrefs(source: str, storage: Optional[Storage] = None) -> List[str]:
+    """
+    List COG hrefs from a manifest file or a prefix
+
+    Args:
+        source (str): text manifest with one href per line, or a directory/prefix
+        on any storage, e.g. "s3://radarsat-r1-l1-cog/2009/"
+        storage (Storage): storage backend of source. Default: by href scheme.
+
+    Returns:
+        list of COG hrefs
+    """
+    if storage is None:
+        storage = get_storage(source)
+
+    if source.endswith(MANIFEST_EXTENSIONS) or os.path.isfile(source):
+        with storage.open(source) as f:
+            lines = f.read().decode().splitlines()
+        return [
+            line.strip() for line in lines
+            if line.strip() and not line.startswith("#")
+        ]
+    return storage.list(source, suffix=".tif")
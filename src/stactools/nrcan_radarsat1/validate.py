@@ -0,0 +1,233 @@
+import json
+import logging
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import lru_cache
+from itertools import islice
+from typing import (Any, Deque, Dict, Iterator, List, NamedTuple, Optional,
+                    Sequence, Tuple, Union)
+from urllib.parse import urlparse
+
+from jsonschema import Draft7Validator
+from jsonschema.exceptions import best_match
+from jsonschema.validators import validator_for
+from jsonschema_specifications import REGISTRY as SPECIFICATIONS
+from referencing import Registry, Resource
+from referencing.exceptions import NoSuchResource, Unresolvable
+
+logger = logging.getLogger(__name__)
+
+# Local mirror of the JSON schemas items are validated against, laid out as
+# <host>/<path> of the schema URI. Refresh with scripts/update-schemas.
+SCHEMA_DIR = os.path.join(os.path.dirname(__file__), "schemas")
+
+ITEM_SCHEMA_URI = (
+    "https://schemas.stacspec.org/v{}/item-spec/json-schema/item.json")
+
+NDJSON_EXTENSIONS = (".ndjson", ".jsonl")
+
+# An item dict, or the error that kept it from being read
+ItemOrError = Union[Dict[str, Any], ValueError]
+
+
+class SchemaNotBundledError(Exception):
+    """Raised when a schema is not available in any local schema directory"""
+
+
+class ValidationResult(NamedTuple):
+    """Outcome of validating one item"""
+    item_id: str
+    source: str
+    errors: List[str]
+
+    @property
+    def valid(self) -> bool:
+        return not self.errors
+
+
+class SchemaStore():
+    """
+    Offline store of compiled JSON schema validators.
+
+    Schemas (and the schemas they reference) are only read from local schema
+    directories, never fetched over the network. Each schema is compiled once
+    and its validator reused for the lifetime of the store.
+    """
+    def __init__(self, schema_dirs: Sequence[str] = ()):
+        """
+        Args:
+        schema_dirs: extra schema directories, searched before the bundled schemas
+        """
+        self.schema_dirs = list(schema_dirs) + [SCHEMA_DIR]
+        self._retrieve = lru_cache(maxsize=None)(self._load_resource)
+        self._registry: Registry = Registry(
+            retrieve=self._retrieve)  # type: ignore[call-arg]
+        self._validators: Dict[str, Any] = {}
+
+    def validator(self, uri: str) -> Draft7Validator:
+        """
+        Return the compiled validator for a schema URI
+
+        Raises:
+        SchemaNotBundledError: if the schema is not available locally
+        """
+        uri = uri.rstrip("#")
+        if uri not in self._validators:
+            schema = self._retrieve(uri).contents
+            cls = validator_for(schema, default=Draft7Validator)
+            self._validators[uri] = cls(schema, registry=self._registry)
+        return self._validators[uri]
+
+    def validate(self, item: Dict[str, Any]) -> List[str]:
+        """
+        Validate an item dict against the core item schema and its extensions
+
+        Returns:
+        list of error messages, empty if the item is valid
+        """
+        uris = [ITEM_SCHEMA_URI.format(item.get("stac_version"))]
+        uris.extend(item.get("stac_extensions", []))
+
+        errors = []
+        for uri in uris:
+            try:
+                validator = self.validator(uri)
+                for error in validator.iter_errors(item):
+                    # Extension schemas are oneOf item/collection: report the
+                    # failing field rather than the whole item
+                    error = best_match([error])
+                    path = "/".join(str(p) for p in error.absolute_path)
+                    errors.append("{}: {}: {}".format(uri, path or "<root>",
+                                                      error.message))
+            except (SchemaNotBundledError, Unresolvable) as e:
+                errors.append("{}: schema not available offline ({})".format(
+                    uri, e))
+        return errors
+
+    def _path(self, uri: str) -> Optional[str]:
+        parsed = urlparse(uri)
+        relpath = os.path.join(parsed.netloc, *parsed.path.split("/"))
+        for schema_dir in self.schema_dirs:
+            path = os.path.join(schema_dir, relpath)
+            if os.path.isfile(path):
+                return path
+        return None
+
+    def _load_resource(self, uri: str) -> Resource:
+        path = self._path(uri)
+        if path is None:
+            try:
+                return SPECIFICATIONS.get_or_retrieve(uri).value
+            except (NoSuchResource, Unresolvable):
+                raise SchemaNotBundledError(uri)
+        with open(path) as f:
+            contents = json.load(f)
+        return Resource.from_contents(contents)
+
+
+_store: Optional[SchemaStore] = None
+
+
+def _init_worker(schema_dirs: Sequence[str]) -> None:
+    global _store
+    _store = SchemaStore(schema_dirs)
+
+
+def _validate_batch(
+        batch: List[Tuple[str, ItemOrError]]) -> List[ValidationResult]:
+    assert _store is not None
+    results = []
+    for source, item in batch:
+        if isinstance(item, ValueError):
+            results.append(ValidationResult("<unknown>", source, [str(item)]))
+        else:
+            results.append(
+                ValidationResult(item.get("id", "<unknown>"), source,
+                                 _store.validate(item)))
+    return results
+
+
+def _load_json(text: str) -> ItemOrError:
+    try:
+        stac_object = json.loads(text)
+    except ValueError as e:
+        return ValueError("invalid JSON: {}".format(e))
+    if not isinstance(stac_object, dict):
+        return ValueError("not a JSON object")
+    return stac_object
+
+
+def iter_item_dicts(paths: Sequence[str]) -> Iterator[Tuple[str, ItemOrError]]:
+    """
+    Read item dicts from NDJSON files, item json files, or directories of them
+
+    Args:
+        paths: NDJSON files, json files, or directories searched recursively
+
+    Returns:
+        Iterator of (source, item dict) tuples. source is the file, with the
+        line number for NDJSON. Lines and files that are not a JSON object
+        yield a ValueError in place of the item dict, so that they are
+        reported with their source rather than ending the run.
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                nested = [
+                    os.path.join(root, f) for f in sorted(files)
+                    if f.endswith(".json") or f.endswith(NDJSON_EXTENSIONS)
+                ]
+                yield from iter_item_dicts(nested)
+        elif path.endswith(NDJSON_EXTENSIONS):
+            with open(path) as f:
+                for line_number, line in enumerate(f, 1):
+                    if line.strip():
+                        yield "{}:{}".format(path,
+                                             line_number), _load_json(line)
+        else:
+            with open(path) as f:
+                stac_object = _load_json(f.read())
+            if (isinstance(stac_object, ValueError)
+                    or stac_object.get("type") == "Feature"):
+                yield path, stac_object
+
+
+def validate_items(paths: Sequence[str],
+                   schema_dirs: Sequence[str] = (),
+                   workers: Optional[int] = None,
+                   batch_size: int = 100) -> Iterator[ValidationResult]:
+    """
+    Validate items in parallel against locally available schemas
+
+    Args:
+        paths: NDJSON files, item json files, or directories of them
+        schema_dirs: extra local schema directories
+        workers: number of worker processes (default: number of CPUs).
+            workers=1 validates in the calling process.
+        batch_size: number of items sent to a worker at a time
+
+    Returns:
+        Iterator of ValidationResult, one per item, in input order
+    """
+    items = iter_item_dicts(paths)
+    batches = iter(lambda: list(islice(items, batch_size)), [])
+
+    if workers == 1:
+        _init_worker(schema_dirs)
+        for batch in batches:
+            yield from _validate_batch(batch)
+        return
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=_init_worker,
+                             initargs=(list(schema_dirs), )) as executor:
+        # Bound the batches in flight so large archives are not read into memory
+        pending: Deque[Future] = deque()
+        for batch in batches:
+            pending.append(executor.submit(_validate_batch, batch))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
@@ -0,0 +1,88 @@
+import os
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import rasterio
+from rasterio.enums import Resampling
+from rasterio.transform import from_origin
+
+TEST_COG_NAME = "RS1_X0597984_F1_20090205_094341_HH_SGF.tif"
+
+
+def create_test_cog(directory: str,
+                    name: str = TEST_COG_NAME,
+                    orbit: int = 68371,
+                    west: float = -75.0) -> str:
+    """Writes a small synthetic Radarsat-1 style COG and returns its path.
+
+    The image has a nodata (0) border around a block of valid backscatter
+    values, and carries the CEOS tags read by Rsat_Metadata.
+    """
+    path = os.path.join(directory, name)
+    size = 256
+    data = np.zeros((size, size), dtype=np.uint8)
+    rng = np.random.default_rng(0)
+    data[32:224, 48:208] = rng.integers(1, 255, size=(192, 160))
+
+    profile = {
+        "driver": "GTiff",
+        "dtype": "uint8",
+        "count": 1,
+        "height": size,
+        "width": size,
+        "crs": "EPSG:4326",
+        "transform": from_origin(west, 46.0, 0.0005, 0.0005),
+        "tiled": True,
+        "blockxsize": 64,
+        "blockysize": 64,
+        "nodata": 0,
+    }
+    with rasterio.open(path, "w", **profile) as dst:
+        dst.write(data, 1)
+        dst.update_tags(CEOS_ASC_DES="ASCENDING ",
+                        CEOS_ORBIT_NUMBER=" {}".format(orbit),
+                        CEOS_PIXEL_SPACING_METERS="12.5",
+                        CEOS_LINE_SPACING_METERS="12.5")
+        dst.build_overviews([2, 4, 8], Resampling.nearest)
+    return path
+
+
+class RangeRequestHandler(SimpleHTTPRequestHandler):
+    """Minimal S3 stand-in: serves files with HTTP range request support"""
+    requests_served = 0
+
+    def do_GET(self):
+        type(self).requests_served += 1
+        path = self.translate_path(self.path)
+        byte_range = self.headers.get("Range")
+        if byte_range is None:
+            return super().do_GET()
+
+        with open(path, "rb") as f:
+            data = f.read()
+        start, end = byte_range.split("=")[1].split("-")
+        body = data[int(start):int(end) + 1]
+        self.send_response(206)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header(
+            "Content-Range", "bytes {}-{}/{}".format(start,
+                                                     int(start) + len(body) - 1,
+                                                     len(data)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_directory(directory: str) -> ThreadingHTTPServer:
+    """Serves directory over HTTP on a free local port, in a background thread.
+    Call shutdown() and server_close() on the returned server when done.
+    """
+    RangeRequestHandler.requests_served = 0
+    handler = partial(RangeRequestHandler, directory=directory)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
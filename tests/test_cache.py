@@ -0,0 +1,113 @@
+import os
+import unittest
+from tempfile import TemporaryDirectory
+
+from rasterio.errors import RasterioIOError
+from stactools.nrcan_radarsat1.cache import BlockCache
+from stactools.nrcan_radarsat1.storage import S3Storage
+from stactools.nrcan_radarsat1.utils import Rsat_Metadata, download_asset
+
+from tests import (TEST_COG_NAME, RangeRequestHandler, create_test_cog,
+                   serve_directory)
+
+
+class BlockCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        self.data_dir = os.path.join(self.tmp_dir.name, "data")
+        os.makedirs(self.data_dir)
+        create_test_cog(self.data_dir)
+
+        self.server = serve_directory(self.data_dir)
+        self.href = "http://127.0.0.1:{}/{}".format(self.server.server_port,
+                                                    TEST_COG_NAME)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp_dir.cleanup()
+
+    def test_second_pass_served_from_disk(self):
+        cache_dir = os.path.join(self.tmp_dir.name, "cache")
+        cache = BlockCache(cache_dir, block_size=4096)
+        first = Rsat_Metadata(self.href, cache=cache)
+        served = RangeRequestHandler.requests_served
+        self.assertGreater(served, 0)
+
+        # A new cache on the same directory, as in a later run
+        cache = BlockCache(cache_dir, block_size=4096)
+        second = Rsat_Metadata(self.href, cache=cache)
+        self.assertEqual(RangeRequestHandler.requests_served, served)
+        self.assertEqual(cache.bytes_fetched, 0)
+        self.assertGreater(cache.hits, 0)
+        self.assertEqual(first.geometry, second.geometry)
+
+        out_dir = os.path.join(self.tmp_dir.name, "out")
+        out_file = download_asset(self.href, out_dir, cache=cache)
+        with open(out_file, "rb") as f, open(
+                os.path.join(self.data_dir, TEST_COG_NAME), "rb") as g:
+            self.assertEqual(f.read(), g.read())
+
+    def test_lru_eviction(self):
+        cache = BlockCache(os.path.join(self.tmp_dir.name, "cache"),
+                           max_bytes=3 * 1024,
+                           block_size=1024)
+        for start in range(0, 5 * 1024, 1024):
+            self.assertEqual(len(cache.read_range(self.href, start, start + 1)),
+                             1)
+        self.assertLessEqual(cache.total_bytes, 3 * 1024)
+
+        # The most recently used block is still cached, the oldest is not
+        served = RangeRequestHandler.requests_served
+        cache.read_range(self.href, 4 * 1024, 4 * 1024 + 1)
+        self.assertEqual(RangeRequestHandler.requests_served, served)
+        cache.read_range(self.href, 0, 1)
+        self.assertEqual(RangeRequestHandler.requests_served, served + 1)
+
+    def test_missing_file_raises(self):
+        cache = BlockCache(os.path.join(self.tmp_dir.name, "cache"))
+        href = "http://127.0.0.1:{}/missing.tif".format(
+            self.server.server_port)
+        with self.assertRaises(RasterioIOError):
+            Rsat_Metadata(href, cache=cache)
+        with self.assertRaises(OSError):
+            cache.open(href)
+
+    def test_block_size_change(self):
+        cache_dir = os.path.join(self.tmp_dir.name, "cache")
+        BlockCache(cache_dir, block_size=4096).read_range(self.href, 0, 8192)
+
+        # Block 1 is a different byte range at this block size
+        cache = BlockCache(cache_dir, block_size=1024)
+        with open(os.path.join(self.data_dir, TEST_COG_NAME), "rb") as f:
+            f.seek(1100)
+            self.assertEqual(cache.read_range(self.href, 1100, 1200),
+                             f.read(100))
+
+    def test_replaced_file_invalidated(self):
+        cache_dir = os.path.join(self.tmp_dir.name, "cache")
+        cache = BlockCache(cache_dir, block_size=4096)
+        self.assertEqual(Rsat_Metadata(self.href, cache=cache).absolute_orbit,
+                         68371)
+
+        # The mirror replaces the COG before a later run
+        cog_path = create_test_cog(self.data_dir, orbit=68372)
+        os.utime(cog_path, (0, 0))
+        cache = BlockCache(cache_dir, block_size=4096)
+        self.assertEqual(Rsat_Metadata(self.href, cache=cache).absolute_orbit,
+                         68372)
+        self.assertEqual(cache.hits, 0)
+        with open(cog_path, "rb") as f:
+            self.assertEqual(cache.read_range(self.href, 0, 10000),
+                             f.read(10000))
+
+    def test_endpoints_not_shared(self):
+        cache_dir = os.path.join(self.tmp_dir.name, "cache")
+        href = "s3://bucket/{}".format(TEST_COG_NAME)
+        caches = [
+            BlockCache(cache_dir,
+                       storage=S3Storage(endpoint_url=url, anonymous=True))
+            for url in ("http://mirror-a:9000", "http://mirror-b:9000")
+        ]
+        self.assertNotEqual(caches[0]._href_dir(href),
+                            caches[1]._href_dir(href))
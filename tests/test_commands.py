@@ -1,11 +1,17 @@
+import json
 import os.path
 from tempfile import TemporaryDirectory
 
 import pystac
+from stactools.nrcan_radarsat1 import constants as c
 from stactools.nrcan_radarsat1.commands import create_nrcanradarsat1_command
+from stactools.nrcan_radarsat1.stac import create_item
 from stactools.testing import CliTestCase
 from stactools.testing import TestData
 
+from tests import TEST_COG_NAME, create_test_cog, serve_directory
+from tests.test_validate import schemas_bundled
+
 test_data = TestData(__file__)
 
 
@@ -60,6 +66,138 @@ class CommandsTest(CliTestCase):
 
             item.validate()
 
+    def test_validate(self):
+        with TemporaryDirectory() as tmp_dir:
+            item = create_item(create_test_cog(tmp_dir), statistics=True)
+            item_dir = os.path.join(tmp_dir, "items")
+            item.save_object(dest_href=os.path.join(item_dir, "item.json"))
+
+            result = self.run_command(
+                ["nrcanradarsat1", "validate", "-s", item_dir, "-w", "1"])
+            if schemas_bundled(*item.stac_extensions):
+                self.assertEqual(result.exit_code,
+                                 0,
+                                 msg="\n{}".format(result.output))
+                self.assertIn("0 of 1 items failed", result.output)
+            else:
+                # Extension schemas missing from the bundle fail loudly
+                self.assertEqual(result.exit_code, 1)
+                self.assertIn("schema not available offline", result.output)
+
+            item.datetime = None
+            item.save_object(dest_href=os.path.join(item_dir, "item.json"))
+            result = self.run_command(
+                ["nrcanradarsat1", "validate", "-s", item_dir, "-w", "1"])
+            self.assertEqual(result.exit_code, 1)
+            self.assertIn(item.id, result.output)
+
+    def test_create_items(self):
+        with TemporaryDirectory() as tmp_dir:
+            cog_dir = os.path.join(tmp_dir, "cogs")
+            os.makedirs(cog_dir)
+            create_test_cog(cog_dir)
+            create_test_cog(cog_dir,
+                            name="RS1_X0597985_F1_20090205_094356_HH_SGF.tif")
+            item_dir = os.path.join(tmp_dir, "items")
+
+            result = self.run_command([
+                "nrcanradarsat1", "create-items", "-s", cog_dir, "-d", item_dir
+            ])
+            self.assertEqual(result.exit_code,
+                             0,
+                             msg="\n{}".format(result.output))
+            jsons = [p for p in os.listdir(item_dir) if p.endswith(".json")]
+            self.assertEqual(len(jsons), 2)
+            item = pystac.read_file(os.path.join(item_dir, jsons[0]))
+            self.assertEqual(item.get_self_href(),
+                             os.path.join(item_dir, jsons[0]))
+
+            result = self.run_command([
+                "nrcanradarsat1", "create-items", "-s", cog_dir, "-d",
+                item_dir, "--ndjson", "items.ndjson"
+            ])
+            self.assertEqual(result.exit_code,
+                             0,
+                             msg="\n{}".format(result.output))
+            with open(os.path.join(item_dir, "items.ndjson")) as f:
+                self.assertEqual(len(f.readlines()), 2)
+
+            segment_dir = os.path.join(tmp_dir, "segments")
+            result = self.run_command([
+                "nrcanradarsat1", "create-items", "-s", cog_dir, "-d",
+                segment_dir, "--orbit-segments"
+            ])
+            self.assertEqual(result.exit_code,
+                             0,
+                             msg="\n{}".format(result.output))
+            self.assertIn("Created 1 orbit segment items", result.output)
+            segment = pystac.read_file(
+                os.path.join(segment_dir, "RS1_ORBIT_68371_20090205.json"))
+            self.assertEqual(len(segment.get_links("derived_from")), 2)
+
+            # A COG not named like a scene does not stop the grouping
+            create_test_cog(cog_dir, name="mosaic.tif")
+            ndjson_dir = os.path.join(tmp_dir, "ndjson")
+            result = self.run_command([
+                "nrcanradarsat1", "create-items", "-s", cog_dir, "-d",
+                ndjson_dir, "--orbit-segments", "--ndjson", "items.ndjson"
+            ])
+            self.assertEqual(result.exit_code,
+                             0,
+                             msg="\n{}".format(result.output))
+            self.assertIn("Created 1 orbit segment items", result.output)
+            self.assertEqual(os.listdir(ndjson_dir), ["items.ndjson"])
+            with open(os.path.join(ndjson_dir, "items.ndjson")) as f:
+                segment = [
+                    json.loads(line) for line in f
+                    if json.loads(line)["id"].startswith("RS1_ORBIT_")
+                ][0]
+            # Scenes in NDJSON have no file to link to, only their ids
+            self.assertEqual(
+                [link for link in segment["links"]
+                 if link["rel"] == "derived_from"], [])
+            self.assertEqual(segment["properties"][c.RADARSAT_SCENES], [
+                "RS1_X0597984_F1_20090205_094341_HH_SGF",
+                "RS1_X0597985_F1_20090205_094356_HH_SGF",
+            ])
+
+    def test_manifest_of_remote_cogs(self):
+        with TemporaryDirectory() as tmp_dir:
+            cog_dir = os.path.join(tmp_dir, "cogs")
+            os.makedirs(cog_dir)
+            create_test_cog(cog_dir)
+            server = serve_directory(cog_dir)
+            self.addCleanup(server.server_close)
+            self.addCleanup(server.shutdown)
+
+            # A local manifest listing COGs on another storage
+            manifest = os.path.join(tmp_dir, "manifest.txt")
+            with open(manifest, "w") as f:
+                f.write("http://127.0.0.1:{}/{}\n".format(
+                    server.server_port, TEST_COG_NAME))
+
+            item_dir = os.path.join(tmp_dir, "items")
+            result = self.run_command([
+                "nrcanradarsat1", "create-items", "-s", manifest, "-d",
+                item_dir, "--s3-endpoint-url", "http://127.0.0.1:1"
+            ])
+            self.assertEqual(result.exit_code,
+                             0,
+                             msg="\n{}".format(result.output))
+            self.assertIn("Created 1 of 1 items", result.output)
+
+            report_path = os.path.join(tmp_dir, "plan.json")
+            result = self.run_command([
+                "nrcanradarsat1", "plan", "-s", manifest, "-o", report_path
+            ])
+            self.assertEqual(result.exit_code,
+                             0,
+                             msg="\n{}".format(result.output))
+            with open(report_path) as f:
+                report = json.load(f)
+            self.assertEqual(report["sampled"], 1)
+            self.assertEqual(report["errors"], [])
+
     # Downloads full cog file. Suggest leaving commented unless desired to test
     def test_download_asset(self):
         enabled = False
@@ -0,0 +1,87 @@
+import os
+import unittest
+from tempfile import TemporaryDirectory
+
+import pystac
+from pystac.extensions.sat import SatExtension
+from pystac.utils import datetime_to_str
+from shapely.geometry import shape
+from stactools.nrcan_radarsat1 import constants as c
+from stactools.nrcan_radarsat1 import grouping, stac, validate
+
+from tests import create_test_cog
+
+
+class GroupingTest(unittest.TestCase):
+    def test_group_scenes(self):
+        hrefs = [
+            "s3://bucket/2009/2/RS1_X0000003_S1_20090205_224010_HH_SGF.tif",
+            "s3://bucket/2009/2/RS1_X0000001_F1_20090205_094341_HH_SGF.tif",
+            "s3://bucket/2009/2/RS1_X0000002_F1_20090205_094356_HH_SGF.tif",
+            "s3://bucket/2009/2/RS1_X0000004_S1_20090206_001500_HH_SGF.tif",
+        ]
+        groups = grouping.group_scenes(hrefs)
+
+        self.assertEqual([g.key for g in groups], [
+            "20090205_094341", "20090205_224010", "20090206_001500"
+        ])
+        self.assertEqual(groups[0].hrefs, hrefs[1:3])
+        self.assertEqual(grouping.grouped_hrefs(groups),
+                         [hrefs[1], hrefs[2], hrefs[0], hrefs[3]])
+
+        unnamed = "s3://bucket/2009/2/mosaic.tif"
+        with self.assertLogs(grouping.logger, "WARNING"):
+            groups = grouping.group_scenes([unnamed] + hrefs)
+        self.assertEqual(groups[-1],
+                         grouping.SceneGroup(grouping.UNGROUPED_KEY, [unnamed]))
+        self.assertEqual(len(groups), 4)
+
+    def test_orbit_segment_item(self):
+        with TemporaryDirectory() as tmp_dir:
+            hrefs = [
+                create_test_cog(tmp_dir,
+                                "RS1_X000000{}_F1_20090205_0943{}_HH_SGF.tif".format(
+                                    i, 41 + i),
+                                orbit=68371 + i // 2,
+                                west=-75.0 + 0.05 * i) for i in range(3)
+            ]
+            items = [
+                stac.create_item(href)
+                for href in grouping.grouped_hrefs(grouping.group_scenes(hrefs))
+            ]
+        for item in items:
+            item.set_self_href(os.path.join(tmp_dir, item.id + ".json"))
+
+        runs = list(grouping.orbit_runs(items))
+        self.assertEqual([len(run) for run in runs], [2, 1])
+
+        segment = stac.create_orbit_segment_item(runs[0])
+        self.assertEqual(segment.id, "RS1_ORBIT_68371_20090205")
+        self.assertEqual(SatExtension.ext(segment).absolute_orbit, 68371)
+        self.assertEqual(segment.properties["start_datetime"],
+                         datetime_to_str(items[0].datetime))
+        self.assertEqual(segment.properties["end_datetime"],
+                         datetime_to_str(items[1].datetime))
+        self.assertEqual(segment.properties[c.RADARSAT_SCENES],
+                         [items[0].id, items[1].id])
+        self.assertEqual(
+            [link.href for link in segment.get_links("derived_from")],
+            [items[0].get_self_href(), items[1].get_self_href()])
+        footprint = shape(segment.geometry)
+        for item in runs[0]:
+            self.assertTrue(footprint.contains(shape(item.geometry)))
+        self.assertGreater(footprint.area, shape(items[0].geometry).area)
+        segment_dict = segment.to_dict()
+        validator = validate.SchemaStore().validator(
+            validate.ITEM_SCHEMA_URI.format(segment_dict["stac_version"]))
+        self.assertEqual(list(validator.iter_errors(segment_dict)), [])
+
+        with self.assertRaises(ValueError):
+            stac.create_orbit_segment_item(items)
+
+    def test_orbit_segment_item_unsaved(self):
+        with TemporaryDirectory() as tmp_dir:
+            item = stac.create_item(create_test_cog(tmp_dir))
+        segment = stac.create_orbit_segment_item([item])
+        self.assertEqual(segment.get_links("derived_from"), [])
+        self.assertIsInstance(segment, pystac.Item)
@@ -0,0 +1,92 @@
+import unittest
+from tempfile import TemporaryDirectory
+
+from stactools.nrcan_radarsat1 import plan
+from stactools.nrcan_radarsat1.storage import LocalStorage
+
+from tests import (TEST_COG_NAME, RangeRequestHandler, create_test_cog,
+                   serve_directory)
+
+HREFS = [
+    "s3://radarsat-r1-l1-cog/2009/2/RS1_X0597984_F1_20090205_094341_HH_SGF.tif",
+    "s3://radarsat-r1-l1-cog/2009/2/RS1_X0597985_F1_20090205_094356_HH_SGF.tif",
+    "s3://radarsat-r1-l1-cog/2009/2/RS1_X0597986_F1_20090205_094411_HH_SGF.tif",
+    "s3://radarsat-r1-l1-cog/2012/8/RS1_B0625465_SCWA_20120822_122459_HH_SCW01F.tif",
+]
+
+
+class PlanTest(unittest.TestCase):
+    def test_scene_group(self):
+        self.assertEqual(plan.scene_group(HREFS[0]), "F1/SGF")
+        self.assertEqual(plan.scene_group(HREFS[3]), "SCWA/SCW")
+
+    def test_sample_covers_groups(self):
+        sample = plan.sample_hrefs(HREFS, 2)
+        self.assertEqual(len(sample), 2)
+        self.assertEqual({plan.scene_group(h)
+                          for h in sample}, {"F1/SGF", "SCWA/SCW"})
+        self.assertEqual(sample, plan.sample_hrefs(HREFS, 2))
+        self.assertEqual(len(plan.sample_hrefs(HREFS, 10)), 4)
+
+    def test_estimate_plan(self):
+        with TemporaryDirectory() as tmp_dir:
+            create_test_cog(tmp_dir)
+            create_test_cog(tmp_dir,
+                            name="RS1_X0597985_F1_20090205_094356_HH_SGF.tif")
+            create_test_cog(
+                tmp_dir, name="RS1_B0625465_SCWA_20120822_122459_HH_SCW01F.tif")
+            server = serve_directory(tmp_dir)
+            self.addCleanup(server.server_close)
+            self.addCleanup(server.shutdown)
+            url = "http://127.0.0.1:{}/".format(server.server_port)
+            hrefs = [
+                url + name for name in [
+                    TEST_COG_NAME,
+                    "RS1_X0597985_F1_20090205_094356_HH_SGF.tif",
+                    "RS1_B0625465_SCWA_20120822_122459_HH_SCW01F.tif",
+                ]
+            ]
+            hrefs.append(url + "README.tif")
+            report = plan.estimate_plan(hrefs, sample_size=2)
+
+        self.assertEqual(report["scope"], plan.SCOPE)
+        self.assertEqual(report["scenes"], 3)
+        self.assertEqual(report["sampled"], 2)
+        self.assertEqual(report["errors"], [{
+            "href": url + "README.tif",
+            "error": "not a RADARSAT-1 scene name"
+        }])
+        f1 = report["groups"]["F1/SGF"]
+        self.assertEqual(f1["scenes"], 2)
+        self.assertEqual(f1["sampled"], 1)
+        self.assertGreater(f1["per_scene"]["item"]["bytes"], 0)
+        self.assertGreater(f1["per_scene"]["item"]["requests"], 0)
+        self.assertEqual(f1["total"]["download"]["bytes"],
+                         2 * f1["per_scene"]["download"]["bytes"])
+        self.assertAlmostEqual(
+            report["total"]["download"]["bytes"],
+            sum(g["total"]["download"]["bytes"]
+                for g in report["groups"].values()))
+
+    def test_measure_scene(self):
+        with TemporaryDirectory() as tmp_dir:
+            cog_path = create_test_cog(tmp_dir)
+            server = serve_directory(tmp_dir)
+            self.addCleanup(server.server_close)
+            self.addCleanup(server.shutdown)
+            url = "http://127.0.0.1:{}/{}".format(server.server_port,
+                                                  TEST_COG_NAME)
+
+            # Natively, the HEAD and every range request GDAL sends is counted
+            native = plan.measure_scene(url)["item"]
+            self.assertEqual(native["requests"],
+                             RangeRequestHandler.requests_served + 1)
+            self.assertGreater(native["bytes"], 0)
+
+            # Through a cache, whole blocks of the run's size are fetched
+            cached = plan.measure_scene(cog_path, cache_block_size=4096)
+            self.assertEqual(cached["item"]["bytes"] % 4096, 0)
+            uncached = plan.measure_scene(cog_path, storage=LocalStorage())
+            self.assertGreater(uncached["item"]["requests"], 0)
+            self.assertLessEqual(uncached["item"]["bytes"],
+                                 cached["download"]["bytes"])
@@ -1,10 +1,14 @@
+import json
 import os
 import unittest
 from tempfile import TemporaryDirectory
 import pystac
+import rasterio
 from stactools.nrcan_radarsat1 import stac
 from stactools.testing import TestData
 
+from tests import create_test_cog
+
 test_data = TestData(__file__)
 
 
@@ -48,6 +52,90 @@ class StacTest(unittest.TestCase):
             item = pystac.read_file(item_path)
             item.validate()
 
+    def test_create_item_statistics(self):
+        with TemporaryDirectory() as tmp_dir:
+            cog_path = create_test_cog(tmp_dir)
+            item = stac.create_item(cog_path, statistics=True)
+            plain_item = stac.create_item(cog_path)
+
+        band = item.assets["cog"].to_dict()["raster:bands"][0]
+        self.assertEqual(band["nodata"], 0)
+        self.assertEqual(band["data_type"], "uint8")
+        self.assertGreater(band["statistics"]["valid_percent"], 0)
+        self.assertLess(band["statistics"]["valid_percent"], 100)
+        self.assertGreaterEqual(band["statistics"]["minimum"], 1)
+        self.assertEqual(len(band["histogram"]["buckets"]), 256)
+        self.assertAlmostEqual(
+            item.properties["nrcan-radarsat1:valid_fraction"] +
+            item.properties["nrcan-radarsat1:nodata_fraction"], 1.0)
+        self.assertIn("p50", item.properties["nrcan-radarsat1:percentiles"])
+        self.assertIn("nrcan-radarsat1:mean_db", item.properties)
+        self.assertNotIn("raster:bands", plain_item.assets["cog"].to_dict())
+
+    def test_create_item_thumbnail(self):
+        with TemporaryDirectory() as tmp_dir:
+            cog_path = create_test_cog(tmp_dir)
+            thumbnail_dir = os.path.join(tmp_dir, "thumbnails")
+            item = stac.create_item(cog_path, thumbnail_dir=thumbnail_dir)
+
+            asset = item.assets["thumbnail"]
+            self.assertEqual(asset.media_type, pystac.MediaType.PNG)
+            self.assertEqual(asset.roles, ["thumbnail"])
+            with rasterio.open(asset.href) as src:
+                self.assertEqual(src.count, 2)
+                self.assertLessEqual(max(src.shape), 512)
+                gray, alpha = src.read()
+            # Nodata border is transparent
+            self.assertEqual(alpha[0, 0], 0)
+            self.assertTrue((gray[alpha > 0] > 0).all())
+
+            item = stac.create_item(cog_path,
+                                    thumbnail_dir=thumbnail_dir,
+                                    thumbnail_format="webp")
+            self.assertTrue(item.assets["thumbnail"].href.endswith(".webp"))
+            self.assertTrue(os.path.exists(item.assets["thumbnail"].href))
+
+    def test_iter_items(self):
+        with TemporaryDirectory() as tmp_dir:
+            names = [
+                "RS1_X0597984_F1_2009020{}_094341_HH_SGF.tif".format(day)
+                for day in range(1, 6)
+            ]
+            hrefs = [create_test_cog(tmp_dir, name) for name in names]
+            missing = os.path.join(tmp_dir, names[0].replace("F1", "F2"))
+            hrefs.insert(2, missing)
+
+            results = list(stac.iter_items(iter(hrefs), concurrency=2,
+                                           ordered=True))
+            self.assertEqual(len(results), len(hrefs))
+            self.assertIsInstance(results[2], stac.ItemCreationError)
+            self.assertEqual(results[2].href, missing)
+            items = [r for r in results if isinstance(r, pystac.Item)]
+            self.assertEqual([item.id for item in items],
+                             [os.path.splitext(name)[0] for name in names])
+
+            results = list(stac.iter_items(hrefs, concurrency=3))
+            self.assertEqual(
+                sorted(r.id for r in results if isinstance(r, pystac.Item)),
+                sorted(item.id for item in items))
+            self.assertEqual(
+                [r.href for r in results
+                 if isinstance(r, stac.ItemCreationError)], [missing])
+
+    def test_write_ndjson(self):
+        with TemporaryDirectory() as tmp_dir:
+            item = stac.create_item(create_test_cog(tmp_dir))
+            href = os.path.join(tmp_dir, "items.ndjson")
+            count = stac.write_ndjson((item for _ in range(5)),
+                                      href,
+                                      chunk_size=1)
+            self.assertEqual(count, 5)
+            with open(href) as f:
+                lines = f.readlines()
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(pystac.Item.from_dict(json.loads(lines[4])).id,
+                         item.id)
+
     def test_download_asset(self):
         enabled = False
         if enabled:
@@ -0,0 +1,169 @@
+import os
+import unittest
+from tempfile import TemporaryDirectory
+
+from botocore.stub import Stubber
+from stactools.nrcan_radarsat1 import storage
+from stactools.nrcan_radarsat1.utils import Rsat_Metadata, download_asset
+
+from tests import (TEST_COG_NAME, RangeRequestHandler, create_test_cog,
+                   serve_directory)
+
+
+class StorageTest(unittest.TestCase):
+    def test_get_storage(self):
+        self.assertIsInstance(storage.get_storage("/tmp/a.tif"),
+                              storage.LocalStorage)
+        self.assertIsInstance(storage.get_storage("s3://bucket/a.tif"),
+                              storage.S3Storage)
+        self.assertIsInstance(storage.get_storage("https://host/a.tif"),
+                              storage.HTTPStorage)
+        self.assertIsInstance(storage.get_storage("memory://a.tif"),
+                              storage.FsspecStorage)
+        self.assertIs(storage.get_storage("s3://bucket/a.tif"),
+                      storage.get_storage("s3://other/b.tif"))
+        endpoint = storage.get_storage("s3://bucket/a.tif",
+                                       endpoint_url="http://localhost:9000")
+        self.assertEqual(endpoint.client.meta.endpoint_url,
+                         "http://localhost:9000")
+
+    def test_local_storage(self):
+        local = storage.LocalStorage()
+        with TemporaryDirectory() as tmp_dir:
+            objects = [(os.path.join(tmp_dir, "sub", "{}.json".format(i)),
+                        str(i).encode()) for i in range(10)]
+            self.assertEqual(local.write_many(objects, batch_size=3), 10)
+            self.assertEqual(len(local.list(tmp_dir, suffix=".json")), 10)
+            self.assertEqual(local.read_range(objects[7][0], 0, 1), b"7")
+            info = local.info(objects[7][0])
+            os.utime(objects[7][0], (0, 0))
+            self.assertEqual(local.info(objects[7][0]).size, info.size)
+            self.assertNotEqual(local.info(objects[7][0]).version,
+                                info.version)
+
+    def test_write_stream(self):
+        local = storage.LocalStorage()
+        memory = storage.FsspecStorage("memory")
+        with TemporaryDirectory() as tmp_dir:
+            for backend, href in [(local, os.path.join(tmp_dir, "a", "b.txt")),
+                                  (memory, "memory://radarsat-test/b.txt")]:
+                backend.write_stream(href, (b"%d" % i for i in range(10)))
+                self.assertEqual(backend.read_range(href, 0, 10),
+                                 b"0123456789")
+
+    def test_s3_multipart_upload(self):
+        s3 = storage.S3Storage(anonymous=True)
+        s3.part_size = 4
+        with Stubber(s3.client) as stubber:
+            stubber.add_response("create_multipart_upload",
+                                 {"UploadId": "upload"}, {
+                                     "Bucket": "bucket",
+                                     "Key": "items.ndjson"
+                                 })
+            for number, body in enumerate([b"012345", b"6789"], 1):
+                stubber.add_response(
+                    "upload_part", {"ETag": str(number)}, {
+                        "Bucket": "bucket",
+                        "Key": "items.ndjson",
+                        "UploadId": "upload",
+                        "PartNumber": number,
+                        "Body": body
+                    })
+            stubber.add_response(
+                "complete_multipart_upload", {}, {
+                    "Bucket": "bucket",
+                    "Key": "items.ndjson",
+                    "UploadId": "upload",
+                    "MultipartUpload": {
+                        "Parts": [{
+                            "ETag": str(n),
+                            "PartNumber": n
+                        } for n in (1, 2)]
+                    }
+                })
+            s3.write_stream("s3://bucket/items.ndjson",
+                            [b"01", b"2345", b"67", b"8", b"9"])
+            stubber.assert_no_pending_responses()
+
+    def test_http_storage_read_only(self):
+        http = storage.HTTPStorage()
+        with self.assertRaises(storage.ReadOnlyStorageError):
+            http.write("https://host/a.json", b"{}")
+        with self.assertRaises(PermissionError):
+            http.write_stream("https://host/a.json", [b"{}"])
+        with self.assertRaises(ValueError):
+            http.list("https://host/")
+
+    def test_range_file_blocks(self):
+        class CountingStorage(storage.FsspecStorage):
+            ranges = []
+
+            def read_range(self, href, start, end):
+                self.ranges.append((start, end))
+                return super().read_range(href, start, end)
+
+        memory = CountingStorage("memory")
+        href = "memory://radarsat-test/blocks.bin"
+        data = bytes(range(256)) * 4
+        memory.write(href, data)
+
+        f = storage.RangeFile(memory, href, block_size=100, max_blocks=3)
+        f.seek(150)
+        self.assertEqual(f.read(20), data[150:170])
+        self.assertEqual(f.read(100), data[170:270])
+        # The missing blocks of one read are fetched in one request
+        f.seek(500)
+        self.assertEqual(f.read(250), data[500:750])
+        self.assertEqual(memory.ranges, [(100, 200), (200, 300), (500, 800)])
+        # Least recently used blocks are dropped
+        f.seek(0)
+        self.assertEqual(f.read(), data)
+        self.assertEqual(memory.ranges[3:], [(0, 500), (800, 1024)])
+
+    def test_fsspec_storage(self):
+        memory = storage.FsspecStorage("memory")
+        objects = [("memory://radarsat-test/{}.json".format(i), b"0123456789")
+                   for i in range(5)]
+        memory.write_many(objects, max_workers=2)
+        self.assertEqual(memory.size(objects[0][0]), 10)
+        self.assertEqual(memory.read_range(objects[0][0], 2, 5), b"234")
+        self.assertEqual(
+            memory.list("memory://radarsat-test", suffix=".json"),
+            sorted(href for href, _ in objects))
+        with memory.open(objects[1][0]) as f:
+            self.assertEqual(f.read(), b"0123456789")
+
+    def test_http_storage(self):
+        with TemporaryDirectory() as tmp_dir:
+            data_dir = os.path.join(tmp_dir, "data")
+            os.makedirs(data_dir)
+            cog_path = create_test_cog(data_dir)
+            server = serve_directory(data_dir)
+            try:
+                href = "http://127.0.0.1:{}/{}".format(server.server_port,
+                                                       TEST_COG_NAME)
+                http = storage.get_storage(href)
+                self.assertEqual(http.size(href), os.path.getsize(cog_path))
+                self.assertIsNotNone(http.info(href).version)
+                with open(cog_path, "rb") as f:
+                    f.seek(100)
+                    self.assertEqual(http.read_range(href, 100, 150),
+                                     f.read(50))
+
+                RangeRequestHandler.requests_served = 0
+                Rsat_Metadata(href)
+                native = RangeRequestHandler.requests_served
+
+                # Buffered, GDAL's small reads do not each become a request
+                RangeRequestHandler.requests_served = 0
+                rsat_metadata = Rsat_Metadata(href, storage=http)
+                self.assertEqual(rsat_metadata.absolute_orbit, 68371)
+                self.assertLessEqual(RangeRequestHandler.requests_served,
+                                     native)
+
+                out_file = download_asset(href, os.path.join(tmp_dir, "out"))
+                self.assertEqual(os.path.getsize(out_file),
+                                 os.path.getsize(cog_path))
+            finally:
+                server.shutdown()
+                server.server_close()
@@ -0,0 +1,64 @@
+import unittest
+from tempfile import TemporaryDirectory
+
+import numpy as np
+from pyproj import Transformer
+from stactools.nrcan_radarsat1 import utils
+
+from tests import create_test_cog
+
+
+class ReprojectionTest(unittest.TestCase):
+    def test_transformer_is_cached(self):
+        self.assertIs(utils.get_transformer(4326, 3857),
+                      utils.get_transformer(4326, 3857))
+        self.assertIs(utils.get_crs(4326), utils.get_crs(4326))
+
+    def test_utm_epsg(self):
+        self.assertEqual(utils.get_utm_epsg(18, False), 32618)
+        self.assertEqual(utils.get_utm_epsg(18, True), 32718)
+
+    def test_transform_geoms_matches_per_point_transform(self):
+        square = {
+            "type": "Polygon",
+            "coordinates": [[(-75.0, 45.0), (-74.0, 45.0), (-74.0, 46.0),
+                             (-75.0, 45.0)]],
+        }
+        multi = {
+            "type": "MultiPolygon",
+            "coordinates": [[[(-100.0, 60.0), (-99.0, 60.0), (-99.0, 61.0),
+                              (-100.0, 60.0)]]],
+        }
+        point = {"type": "Point", "coordinates": (-120.0, 50.0)}
+
+        out = utils.transform_geoms([square, multi, point], 4326, 3857)
+
+        transformer = Transformer.from_crs(4326, 3857, always_xy=True)
+        expected = transformer.transform(-74.0, 46.0)
+        np.testing.assert_allclose(out[0]["coordinates"][0][2], expected)
+        expected = transformer.transform(-99.0, 61.0)
+        np.testing.assert_allclose(out[1]["coordinates"][0][0][2], expected)
+        expected = transformer.transform(-120.0, 50.0)
+        np.testing.assert_allclose(out[2]["coordinates"], expected)
+        self.assertEqual(out[1]["type"], "MultiPolygon")
+        self.assertEqual(len(out[0]["coordinates"][0]), 4)
+
+    def test_transform_geoms_same_crs_rounds(self):
+        point = {"type": "Point", "coordinates": (-120.123456789, 50.0)}
+        out = utils.transform_geoms([point], 4326, 4326, precision=5)
+        self.assertEqual(out[0]["coordinates"], [-120.12346, 50.0])
+
+
+class RsatMetadataTest(unittest.TestCase):
+    def test_metadata(self):
+        with TemporaryDirectory() as tmp_dir:
+            cog_path = create_test_cog(tmp_dir)
+            rsat_metadata = utils.Rsat_Metadata(href=cog_path)
+
+        self.assertEqual(rsat_metadata.epsg, 4326)
+        self.assertEqual(rsat_metadata.orbit_state, "ascending")
+        self.assertEqual(rsat_metadata.absolute_orbit, 68371)
+        self.assertEqual(rsat_metadata.geometry["type"], "Polygon")
+        minx, miny, maxx, maxy = rsat_metadata.bbox
+        for x, y in rsat_metadata.geometry["coordinates"][0]:
+            self.assertTrue(minx <= x <= maxx and miny <= y <= maxy)
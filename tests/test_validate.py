@@ -0,0 +1,173 @@
+import json
+import os
+import unittest
+from tempfile import TemporaryDirectory
+from urllib.parse import urlparse
+
+import pystac.validation
+from pystac.extensions.projection import ProjectionExtension
+from pystac.extensions.raster import RasterExtension
+from pystac.extensions.sar import SarExtension
+from pystac.extensions.sat import SatExtension
+from stactools.nrcan_radarsat1 import stac
+from stactools.nrcan_radarsat1.validate import (ITEM_SCHEMA_URI, SCHEMA_DIR,
+                                                SchemaStore, validate_items)
+
+from tests import create_test_cog
+
+TEST_SCHEMA_URI = "https://example.com/radarsat-test/v1.0.0/schema.json"
+
+EXTENSION_SCHEMA_URIS = [
+    SarExtension.get_schema_uri(),
+    SatExtension.get_schema_uri(),
+    ProjectionExtension.get_schema_uri(),
+    RasterExtension.get_schema_uri(),
+]
+
+
+def bundled_path(uri):
+    parsed = urlparse(uri)
+    return os.path.join(SCHEMA_DIR, parsed.netloc, *parsed.path.split("/"))
+
+
+def schemas_bundled(*uris):
+    return all(os.path.isfile(bundled_path(uri)) for uri in uris)
+
+
+# Generated items can only be validated once scripts/update-schemas.py has
+# vendored the schemas of the extensions they use
+requires_extension_schemas = unittest.skipUnless(
+    schemas_bundled(*EXTENSION_SCHEMA_URIS),
+    "extension schemas not bundled, run scripts/update-schemas.py")
+
+
+class ValidateTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        item = stac.create_item(create_test_cog(self.tmp_dir.name),
+                                statistics=True)
+        self.item = json.loads(json.dumps(item.to_dict()))
+
+        # A local stand-in for an extension schema not bundled with the package
+        self.schema_dir = os.path.join(self.tmp_dir.name, "schemas")
+        schema_path = os.path.join(self.schema_dir, "example.com",
+                                   "radarsat-test", "v1.0.0", "schema.json")
+        os.makedirs(os.path.dirname(schema_path))
+        with open(schema_path, "w") as f:
+            json.dump(
+                {
+                    "$schema": "http://json-schema.org/draft-07/schema#",
+                    "$id": TEST_SCHEMA_URI,
+                    "type": "object",
+                    "properties": {
+                        "properties": {
+                            "required": ["sat:absolute_orbit"]
+                        }
+                    },
+                }, f)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_bundled_schemas(self):
+        # The bundled core schemas are the published ones pystac also ships
+        pystac_dir = os.path.join(os.path.dirname(pystac.validation.__file__),
+                                  "jsonschemas")
+        bundled_dir = os.path.dirname(
+            bundled_path(ITEM_SCHEMA_URI.format("1.1.0")))
+        names = sorted(os.listdir(bundled_dir))
+        self.assertIn("item.json", names)
+        for directory, pystac_subdir in [
+            (bundled_dir, os.path.join("stac-spec", "v1.1.0")),
+            (os.path.join(SCHEMA_DIR, "geojson.org", "schema"), "geojson"),
+        ]:
+            for name in os.listdir(directory):
+                with open(os.path.join(directory, name)) as f:
+                    bundled = json.load(f)
+                with open(os.path.join(pystac_dir, pystac_subdir, name)) as f:
+                    self.assertEqual(bundled, json.load(f), msg=name)
+
+    @requires_extension_schemas
+    def test_schema_store(self):
+        store = SchemaStore()
+        self.assertEqual(store.validate(self.item), [])
+        sar_uri = SarExtension.get_schema_uri()
+        self.assertIs(store.validator(sar_uri), store.validator(sar_uri))
+
+        self.item["properties"]["sar:frequency_band"] = "Z"
+        errors = store.validate(self.item)
+        self.assertEqual(len(errors), 1)
+        self.assertTrue(
+            errors[0].startswith(sar_uri +
+                                 ": properties/sar:frequency_band:"))
+
+    @unittest.skipUnless(
+        schemas_bundled(ITEM_SCHEMA_URI.format("1.0.0"),
+                        *EXTENSION_SCHEMA_URIS),
+        "STAC 1.0.0 schemas not bundled, run scripts/update-schemas.py")
+    def test_stac_1_0_0(self):
+        self.item["stac_version"] = "1.0.0"
+        self.assertEqual(SchemaStore().validate(self.item), [])
+
+    def test_schema_dirs(self):
+        store = SchemaStore([self.schema_dir])
+        validator = store.validator(TEST_SCHEMA_URI)
+        self.assertEqual(list(validator.iter_errors(self.item)), [])
+
+        self.item["stac_extensions"].append(TEST_SCHEMA_URI)
+        del self.item["properties"]["sat:absolute_orbit"]
+        errors = [
+            e for e in store.validate(self.item)
+            if e.startswith(TEST_SCHEMA_URI)
+        ]
+        self.assertEqual(len(errors), 1)
+        self.assertNotIn("not available offline", errors[0])
+
+    def test_missing_schema_reported(self):
+        self.item["stac_extensions"].append(TEST_SCHEMA_URI)
+        errors = [
+            e for e in SchemaStore().validate(self.item)
+            if e.startswith(TEST_SCHEMA_URI)
+        ]
+        self.assertEqual(len(errors), 1)
+        self.assertIn("not available offline", errors[0])
+
+    def test_validate_items(self):
+        broken = dict(self.item, id="broken")
+        del broken["geometry"]
+        ndjson_path = os.path.join(self.tmp_dir.name, "items.ndjson")
+        with open(ndjson_path, "w") as f:
+            for item in [self.item, broken, self.item]:
+                f.write(json.dumps(item) + "\n")
+
+        results = list(validate_items([ndjson_path], workers=2, batch_size=1))
+        self.assertEqual([r.item_id for r in results],
+                         [self.item["id"], "broken", self.item["id"]])
+        item_uri = ITEM_SCHEMA_URI.format(self.item["stac_version"])
+        self.assertEqual(
+            [any(e.startswith(item_uri) for e in r.errors) for r in results],
+            [False, True, False])
+        self.assertEqual(results[1].source, ndjson_path + ":2")
+        if schemas_bundled(*EXTENSION_SCHEMA_URIS):
+            self.assertEqual([r.valid for r in results], [True, False, True])
+
+    def test_malformed_json_reported(self):
+        ndjson_path = os.path.join(self.tmp_dir.name, "items.ndjson")
+        with open(ndjson_path, "w") as f:
+            f.write(json.dumps(self.item) + "\n{broken\n[]\n")
+        json_path = os.path.join(self.tmp_dir.name, "broken.json")
+        with open(json_path, "w") as f:
+            f.write("{")
+
+        results = list(
+            validate_items([ndjson_path, json_path], workers=2, batch_size=2))
+        self.assertEqual([r.source for r in results], [
+            ndjson_path + ":1", ndjson_path + ":2", ndjson_path + ":3",
+            json_path
+        ])
+        self.assertEqual(results[0].item_id, self.item["id"])
+        for result in results[1:]:
+            self.assertEqual(result.item_id, "<unknown>")
+            self.assertFalse(result.valid)
+        self.assertTrue(results[1].errors[0].startswith("invalid JSON"))
+        self.assertEqual(results[2].errors, ["not a JSON object"])